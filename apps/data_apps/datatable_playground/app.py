@@ -1,11 +1,18 @@
+import asyncio
 import logging
+import os
+import time
 from pathlib import Path
 from uuid import uuid4
 
 import datatable as dt
 from h2o_wave import Q, main, app, copy_expando, handle_on, on
 
+import cache
 import cards
+import constants
+import query
+import scratch
 import utils
 
 # Set up logging
@@ -23,6 +30,12 @@ async def serve(q: Q):
         if not q.app.initialized:
             await initialize_app(q)
 
+        # Release idle clients, and mark this client as active
+        release_idle_clients(q)
+        q.client.last_seen = time.monotonic()
+        if q.client.initialized:
+            q.app.scratch.touch(q.client.scratch_id)
+
         # Initialize the client if not already
         if not q.client.initialized:
             await initialize_client(q)
@@ -39,6 +52,10 @@ async def serve(q: Q):
         elif q.args.dataset is not None and q.args.dataset != q.client.dataset:
             await update_dataset(q)
 
+        # Update table page if paged, sorted, searched, filtered or reset
+        elif q.events[q.client.table_name]:
+            await update_table_page(q)
+
         # Delegate query to query handlers
         elif await handle_on(q):
             pass
@@ -61,7 +78,31 @@ async def initialize_app(q: Q):
     # Set initial argument values
     q.app.cards = ['main', 'error']
 
-    q.app.default_data = dt.fread('waveton_sample.csv')
+    # Report progress of reading datasets
+    dt.options.progress.enabled = True
+    dt.options.progress.callback = utils.update_read_progress
+
+    # Cache of query results shared across clients
+    q.app.query_cache = cache.QueryCache(max_memory=constants.QUERY_RESULTS_MEMORY)
+
+    # Datasets shared across clients, with the default dataset always loaded and schemas of text datasets remembered,
+    # dropping results of queries on datasets once evicted
+    q.app.datasets = cache.DatasetRegistry(
+        max_memory=constants.DATASETS_MEMORY,
+        schemas=cache.SchemaCache(max_size=constants.SCHEMA_CACHE_SIZE),
+        results=q.app.query_cache
+    )
+    q.app.datasets.acquire(path='waveton_sample.csv')
+
+    # Scratch space for files downloaded by clients
+    q.app.scratch = scratch.ScratchSpace(
+        root=constants.SCRATCH_DIR,
+        quota=constants.SCRATCH_QUOTA,
+        timeout=constants.SCRATCH_CLIENT_TIMEOUT
+    )
+
+    # Clients by their id, released once idle
+    q.app.clients = {}
 
     q.app.initialized = True
 
@@ -75,11 +116,12 @@ async def initialize_client(q: Q):
 
     # Set initial argument values
     q.client.theme_dark = True
-    q.client.datasets = ['waveton_sample.csv']
+    q.client.datasets = {'waveton_sample.csv': 'waveton_sample.csv'}
     q.client.dataset = 'waveton_sample.csv'
-    q.client.data = q.app.default_data
-    q.client.data_query = q.client.data
     q.client.query = ''
+    q.client.table_name = 'data'
+    q.client.scratch_id = str(uuid4())
+    q.app.clients[q.client.scratch_id] = q.client
 
     # Add layouts, header and footer
     q.page['meta'] = cards.meta
@@ -89,6 +131,11 @@ async def initialize_client(q: Q):
     # Add cards for the main page
     q.page['main'] = cards.main
 
+    # Load default dataset
+    await load_dataset(q)
+    q.client.data_query = q.client.data
+    q.client.query_key = None
+
     q.client.initialized = True
 
     await update_table(q)
@@ -129,20 +176,80 @@ async def update_table(q: Q):
     q.page['main'].items[1].separator.label = q.client.query
 
     # Update table name with random string
-    q.page['main'].items[2].table.name = str(uuid4())
+    q.client.table_name = str(uuid4())
+    q.page['main'].items[2].table.name = q.client.table_name
+
+    # Reset table page, sort, search and filters
+    q.client.table_offset = 0
+    q.client.table_sort = None
+    q.client.table_search = None
+    q.client.table_filters = None
+    q.client.data_view = q.client.data_query
+
+    # Update table columns in a background thread, as filters of string columns scan the whole data
+    q.page['main'].items[2].table.columns = await q.run(utils.create_table_columns, data=q.client.data_view)
+
+    await update_table_rows(q)
+
+
+async def update_table_page(q: Q):
+    """
+    Update table page based on table events.
+    """
+
+    logging.info('Updating table page')
+
+    table_event = q.events[q.client.table_name]
 
-    # Update table columns
-    q.page['main'].items[2].table.columns = utils.create_table_columns(data=q.client.data_query)
+    if table_event.reset:
+        q.client.table_sort = None
+        q.client.table_search = None
+        q.client.table_filters = None
+
+    if table_event.sort:
+        q.client.table_sort = table_event.sort
+
+    if table_event.search is not None:
+        # Search is sent either as the term or as the term with searchable columns
+        search = table_event.search
+        q.client.table_search = search.get('value') if isinstance(search, dict) else search
+
+    if table_event.filter:
+        q.client.table_filters = table_event.filter
+
+    if table_event.page_change:
+        q.client.table_offset = table_event.page_change.get('offset', 0)
+    else:
+        # Sort, search and filters are pushed down to the data in a background thread, and the first page displayed
+        q.client.table_offset = 0
+        q.client.data_view = await q.run(
+            utils.create_table_view,
+            data=q.client.data_query,
+            sort=q.client.table_sort,
+            search=q.client.table_search,
+            filters=q.client.table_filters
+        )
+
+    await update_table_rows(q)
+
+
+async def update_table_rows(q: Q):
+    """
+    Update table rows with the current page.
+    """
+
+    # Update table pagination
+    q.page['main'].items[2].table.pagination = utils.create_table_pagination(data=q.client.data_view)
 
     # Update table rows
-    q.page['main'].items[2].table.rows = utils.create_table_rows(data=q.client.data_query)
+    q.page['main'].items[2].table.rows = utils.create_table_rows(data=q.client.data_view, offset=q.client.table_offset)
 
     await q.page.save()
 
 
-async def update_dataset(q: Q):
+async def update_dataset(q: Q, fingerprint: str = None):
     """
-    Update dataset.
+    Update dataset, with the fingerprint of its file if known.
     """
 
     logging.info('Updating dataset')
@@ -151,19 +258,65 @@ async def update_dataset(q: Q):
         q.client.dataset = q.args.dataset
 
     # Update to new dataset
-    q.client.data = dt.fread(q.client.dataset)
+    await load_dataset(q, fingerprint=fingerprint)
     q.client.data_query = q.client.data
 
     # Reset query
     q.client.query = ''
+    q.client.query_key = None
 
     # Update dropdown
-    q.page['main'].items[0].inline.items[1].dropdown.choices = utils.create_choices_from_list(values=q.client.datasets)
+    q.page['main'].items[0].inline.items[1].dropdown.choices = utils.create_choices_from_list(values=list(q.client.datasets))
     q.page['main'].items[0].inline.items[1].dropdown.value = q.client.dataset
 
     await update_table(q)
 
 
+async def load_dataset(q: Q, fingerprint: str = None):
+    """
+    Load dataset from the datasets shared across clients, with the fingerprint of its file if known.
+    """
+
+    path_data = q.client.datasets[q.client.dataset]
+
+    # Uploaded datasets are kept in scratch space while used, but may be evicted after the client is idle for long
+    # Uploaded datasets are stored by their fingerprint, so it is known without reading them
+    if path_data.startswith(constants.UPLOADS_DIR):
+        if os.path.exists(path_data):
+            q.app.scratch.add(path_data, client=q.client.scratch_id)
+            fingerprint = fingerprint or Path(path_data).stem
+        else:
+            logging.info(f'Dataset {q.client.dataset} is evicted, loading default dataset')
+            del q.client.datasets[q.client.dataset]
+            q.client.dataset = 'waveton_sample.csv'
+            path_data, fingerprint = q.client.datasets[q.client.dataset], None
+
+    # Load dataset in a background thread, to not block other clients
+    progress = {'message': 'Loading dataset', 'value': 0}
+    loading = asyncio.ensure_future(q.run(
+        q.app.datasets.acquire,
+        path=path_data,
+        progress=progress,
+        fingerprint=fingerprint
+    ))
+
+    # Display progress while loading, if not loaded immediately
+    await asyncio.wait([loading], timeout=constants.PROGRESS_INTERVAL)
+    if not loading.done():
+        while not loading.done():
+            q.page['meta'].dialog = cards.dialog_progress(message=progress['message'], value=progress['value'])
+            await q.page.save()
+            await asyncio.wait([loading], timeout=constants.PROGRESS_INTERVAL)
+
+        q.page['meta'].dialog = None
+
+    dataset_key = loading.result()
+    q.app.datasets.release(q.client.dataset_key)
+
+    q.client.dataset_key = dataset_key
+    q.client.data, q.client.data_fingerprint = q.app.datasets.get(q.client.dataset_key)
+
+
 @on('add_dataset')
 async def add_dataset(q: Q):
     """
@@ -185,17 +338,31 @@ async def upload_dataset(q: Q):
 
     logging.info('Uploading new dataset')
 
-    # Download dataset to app
-    path_data = Path(await q.site.download(q.args.upload[0], '.'))
+    # Download dataset to app, reusing the dataset of a file already uploaded
+    path_data, fingerprint = await download_dataset(q, url=q.args.upload[0])
 
     # Update to new dataset
-    q.client.dataset = path_data.name
-    q.client.datasets.append(q.client.dataset)
+    q.client.dataset = Path(q.args.upload[0]).name
+    q.client.datasets[q.client.dataset] = path_data
 
     # Remove dialog
     q.page['meta'].dialog = None
 
-    await update_dataset(q)
+    await update_dataset(q, fingerprint=fingerprint)
+
+
+async def download_dataset(q: Q, url: str) -> tuple[str, str]:
+    """
+    Download uploaded dataset into the store of uploads, keeping a single copy of repeatedly uploaded datasets.
+    Returns the path of the stored dataset and its fingerprint.
+    """
+
+    # Download into the scratch space of the client, so that datasets of the same name uploaded together do not collide
+    path_data = await q.site.download(url, q.app.scratch.client_dir(q.client.scratch_id))
+    path_stored, fingerprint = await q.run(utils.store_upload, path=path_data)
+    q.app.scratch.add(path_stored, client=q.client.scratch_id)
+
+    return path_stored, fingerprint
 
 
 async def apply_query(q: Q):
@@ -212,13 +379,28 @@ async def apply_query(q: Q):
     if q.client.query == '':
         # Reset data
         q.client.data_query = q.client.data
+        q.client.query_key = None
 
         await update_table(q)
     else:
         try:
-            # Check if query is valid
-            data_query = eval(utils.prepare_query(q.client.query))
+            # Check if query is valid, reusing results of the same operations on the same dataset, applying it in a
+            # background thread so that other clients are not blocked
+            data = q.client.data
+            data_query, query_key = await q.run(
+                query.apply_query,
+                query=q.client.query,
+                data=data,
+                fingerprint=q.client.data_fingerprint,
+                results=q.app.query_cache
+            )
+
+            # Ignore the result if the dataset changed while applying the query
+            if q.client.data is not data:
+                return
+
             q.client.data_query = data_query
+            q.client.query_key = query_key
 
             await update_table(q)
         except:
@@ -226,6 +408,34 @@ async def apply_query(q: Q):
             await handle_fallback(q)
 
 
+@on('profile')
+async def show_profile(q: Q):
+    """
+    Show profile of the dataset, or of its query result.
+    """
+
+    logging.info('Showing profile')
+
+    # Profiles are computed once and cached alongside the dataset or query result
+    if q.client.query_key is None:
+        profile = q.app.datasets.get_profile(q.client.dataset_key)
+    else:
+        profile = q.app.query_cache.get_profile(q.client.query_key)
+
+    if profile is None:
+        profile = await q.run(utils.create_profile, data=q.client.data_query)
+
+        if q.client.query_key is None:
+            q.app.datasets.put_profile(q.client.dataset_key, profile)
+        else:
+            q.app.query_cache.put_profile(q.client.query_key, profile)
+
+    q.page['meta'].dialog = cards.dialog_profile(profile=profile)
+
+    await q.page.save()
+
+
+@on('dialog_profile.dismissed')
 @on('dialog_upload_dataset.dismissed')
 async def dismiss_dialog(q: Q):
     """
@@ -239,6 +449,26 @@ async def dismiss_dialog(q: Q):
     await q.page.save()
 
 
+def release_idle_clients(q: Q):
+    """
+    Release clients idle for longer than the timeout, along with their datasets and query results.
+    Wave does not report clients disconnecting, so clients of closed tabs are released once idle instead, and
+    initialized again if they return.
+    """
+
+    now = time.monotonic()
+    for client_id, client in list(q.app.clients.items()):
+        if now - client.last_seen > constants.CLIENT_TIMEOUT:
+            logging.info(f'Releasing idle client {client_id}')
+
+            q.app.datasets.release(client.dataset_key)
+            client.dataset_key = None
+            client.data = client.data_query = client.data_view = None
+            client.initialized = False
+
+            del q.app.clients[client_id]
+
+
 def clear_cards(q: Q, card_names: list):
     """
     Clear cards from the page.
@@ -278,6 +508,10 @@ async def reload_client(q: Q):
     # Clear all cards
     clear_cards(q, q.app.cards)
 
+    # Release scratch space of the client
+    q.app.scratch.release(q.client.scratch_id)
+    q.app.clients.pop(q.client.scratch_id, None)
+
     # Reload the client
     await initialize_client(q)
 
@@ -0,0 +1,67 @@
+import random
+import time
+
+import datatable as dt
+from h2o_wave import ui
+
+import utils
+
+# Number of rows of data to benchmark
+N_ROWS = [10_000, 100_000, 1_000_000]
+
+
+def create_data(n_rows: int) -> dt.Frame:
+    """
+    Create random data similar to the sample dataset.
+    """
+
+    return dt.Frame(
+        timestamp=[f'2020-01-{i % 28 + 1:02d} 12:00:00' for i in range(n_rows)],
+        user=[f'U{random.randint(1, 100)}' for _ in range(n_rows)],
+        age=[random.choice([None, *range(18, 80)]) for _ in range(n_rows)],
+        price=[random.random() * 10 for _ in range(n_rows)],
+        quantity=[random.randint(1, 10) for _ in range(n_rows)]
+    )[:, [dt.as_type(dt.f.timestamp, dt.Type.time64), dt.f[1:]]]
+
+
+def create_table_rows_by_row(data: dt.Frame) -> list[ui.TableRow]:
+    """
+    Create rows of data by slicing each row, the previous implementation.
+    """
+
+    return [
+        ui.table_row(name=str(i), cells=[str(value) for value in data[i, :].to_tuples()[0]]) for i in range(data.nrows)
+    ]
+
+
+def create_table_rows_by_column(data: dt.Frame) -> list[ui.TableRow]:
+    """
+    Create rows of data by converting each column at once.
+    """
+
+    return [ui.table_row(name=str(i), cells=list(cells)) for i, cells in enumerate(utils.create_table_cells(data=data))]
+
+
+def main():
+    """
+    Compare rows/sec of creating table rows by row and by column.
+    """
+
+    print(f'{"rows":>10}  {"by row (rows/sec)":>20}  {"by column (rows/sec)":>22}  {"speedup":>8}')
+
+    for n_rows in N_ROWS:
+        data = create_data(n_rows=n_rows)
+
+        start = time.perf_counter()
+        create_table_rows_by_row(data=data)
+        by_row = n_rows / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        create_table_rows_by_column(data=data)
+        by_column = n_rows / (time.perf_counter() - start)
+
+        print(f'{n_rows:>10}  {by_row:>20,.0f}  {by_column:>22,.0f}  {by_column / by_row:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
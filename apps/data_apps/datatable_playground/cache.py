@@ -0,0 +1,271 @@
+import logging
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import datatable as dt
+
+import utils
+
+
+class QueryCache:
+    """
+    Least recently used cache of query results, shared across clients and bounded by memory.
+    Results are materialized before caching, as views of a dataset report only the size of their row index while
+    keeping the whole dataset referenced. Queries are applied in background threads, so the cache is guarded by a lock.
+    """
+
+    def __init__(self, max_memory: int):
+        self.max_memory = max_memory
+        self.memory = 0
+        self.hits = 0
+        self.misses = 0
+        self.results = OrderedDict()
+        self.lock = threading.Lock()
+
+    def find(self, keys: list[tuple]) -> tuple[int, dt.Frame]:
+        """
+        Find the last of the keys of queries with a cached result, counting a single hit or miss.
+        Returns its position and result, -1 and None if none is cached.
+        """
+
+        with self.lock:
+            for i in reversed(range(len(keys))):
+                if keys[i] in self.results:
+                    self.hits += 1
+                    self.results.move_to_end(keys[i])
+                    return i, self.results[keys[i]]['data']
+
+            self.misses += 1
+
+        return -1, None
+
+    def put(self, key: tuple, data: dt.Frame):
+        """
+        Cache result of a query, evicting least recently used results beyond the memory limit.
+        The result is materialized in place, so its size is measured and it no longer references its dataset.
+        """
+
+        with self.lock:
+            if key in self.results:
+                return
+
+        data.materialize()
+        memory = sys.getsizeof(data)
+        if memory > self.max_memory:
+            return
+
+        with self.lock:
+            if key in self.results:
+                return
+
+            self.results[key] = {'data': data, 'memory': memory, 'profile': None}
+            self.memory += memory
+
+            while self.memory > self.max_memory:
+                _, result = self.results.popitem(last=False)
+                self.memory -= result['memory']
+
+        logging.info(f'Query cache: {len(self.results)} results, {self.memory} bytes, '
+                     f'{self.hits} hits, {self.misses} misses')
+
+    def drop(self, fingerprint: str):
+        """
+        Drop results of queries on a dataset, once it is evicted, as results may share columns with the dataset.
+        """
+
+        with self.lock:
+            for key in [key for key in self.results if key[0] == fingerprint]:
+                self.memory -= self.results.pop(key)['memory']
+
+    def get_profile(self, key: tuple) -> dict:
+        """
+        Get profile of result of a query, None if not cached.
+        """
+
+        with self.lock:
+            return self.results[key]['profile'] if key in self.results else None
+
+    def put_profile(self, key: tuple, profile: dict):
+        """
+        Cache profile of result of a query, alongside the result.
+        """
+
+        with self.lock:
+            if key in self.results:
+                self.results[key]['profile'] = profile
+
+
+class DatasetRegistry:
+    """
+    Registry of datasets shared across clients, loading each version of a file only once.
+    Datasets not used by any client are evicted, least recently used first, beyond the memory limit.
+    Datasets are loaded in background threads, so the registry is guarded by a lock.
+    Results of queries on evicted datasets are dropped along with them, so their memory is freed.
+    """
+
+    def __init__(self, max_memory: int, schemas, results: QueryCache):
+        self.max_memory = max_memory
+        self.memory = 0
+        self.datasets = OrderedDict()
+        self.schemas = schemas
+        self.results = results
+        self.lock = threading.Lock()
+        self.loading = {}
+        self.fingerprints = {}
+
+    def acquire(self, path: str, progress: dict = None, fingerprint: str = None) -> tuple:
+        """
+        Load dataset from file if not already loaded, and add a client using it.
+        The fingerprint of the file is computed if not known, and remembered for loading it again once evicted.
+        Returns the key of the dataset, by path, modification time and size of the file.
+        """
+
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+        # Clients loading the same dataset at the same time wait for it to be loaded once
+        with self.lock:
+            loading = self.loading.setdefault(key, threading.Lock())
+
+        try:
+            self.load(key=key, path=path, loading=loading, progress=progress, fingerprint=fingerprint)
+        finally:
+            # Clients arriving once the dataset is loaded find it without waiting, so the lock is no longer needed
+            with self.lock:
+                if self.loading.get(key) is loading:
+                    del self.loading[key]
+
+        with self.lock:
+            self.datasets.move_to_end(key)
+            self.evict()
+
+        return key
+
+    def load(self, key: tuple, path: str, loading: threading.Lock, progress: dict = None, fingerprint: str = None):
+        """
+        Load dataset from file while holding its loading lock, or add a client using it if already loaded.
+        """
+
+        with loading:
+            with self.lock:
+                dataset = self.datasets.get(key)
+                if dataset is not None:
+                    dataset['clients'] += 1
+
+            if dataset is None:
+                logging.info(f'Loading dataset {path}')
+
+                with self.lock:
+                    fingerprint = fingerprint or self.fingerprints.get(key)
+                if fingerprint is None:
+                    fingerprint = utils.fingerprint_file(path=path, progress=progress)
+                data = utils.read_dataset(path=path, fingerprint=fingerprint, schemas=self.schemas, progress=progress)
+
+                with self.lock:
+                    self.fingerprints[key] = fingerprint
+                    self.datasets[key] = {
+                        'data': data,
+                        'fingerprint': fingerprint,
+                        'memory': sys.getsizeof(data),
+                        'profile': None,
+                        'clients': 1
+                    }
+                    self.memory += self.datasets[key]['memory']
+
+                    # Converted datasets are kept on disk within their size limit, except those loaded
+                    utils.evict_cached_datasets(keep={dataset['fingerprint'] for dataset in self.datasets.values()})
+
+    def get(self, key: tuple) -> tuple[dt.Frame, str]:
+        """
+        Get data and its fingerprint of a dataset.
+        """
+
+        with self.lock:
+            return self.datasets[key]['data'], self.datasets[key]['fingerprint']
+
+    def get_profile(self, key: tuple) -> dict:
+        """
+        Get profile of a dataset, None if not computed yet.
+        """
+
+        with self.lock:
+            return self.datasets[key]['profile'] if key in self.datasets else None
+
+    def put_profile(self, key: tuple, profile: dict):
+        """
+        Cache profile of a dataset, alongside the dataset.
+        """
+
+        with self.lock:
+            if key in self.datasets:
+                self.datasets[key]['profile'] = profile
+
+    def release(self, key: tuple):
+        """
+        Remove a client using the dataset.
+        """
+
+        with self.lock:
+            if key in self.datasets:
+                self.datasets[key]['clients'] -= 1
+                self.evict()
+
+    def evict(self):
+        """
+        Evict datasets not used by any client while beyond the memory limit, with the lock held.
+        """
+
+        for key in list(self.datasets):
+            if self.memory <= self.max_memory:
+                break
+
+            if self.datasets[key]['clients'] == 0:
+                logging.info(f'Evicting dataset {key[0]}')
+                dataset = self.datasets.pop(key)
+                self.memory -= dataset['memory']
+
+                # The same file may be loaded under another path or modification time
+                if all(other['fingerprint'] != dataset['fingerprint'] for other in self.datasets.values()):
+                    self.results.drop(dataset['fingerprint'])
+
+
+class SchemaCache:
+    """
+    Least recently used cache of schemas of text datasets by their header, shared across clients.
+    Datasets are read in background threads, so the cache is guarded by a lock.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.schemas = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, header: bytes) -> dict:
+        """
+        Get schema of text datasets with a header, None if not cached.
+        """
+
+        with self.lock:
+            if header not in self.schemas:
+                return None
+
+            self.schemas.move_to_end(header)
+
+            return self.schemas[header]
+
+    def put(self, header: bytes, schema: dict):
+        """
+        Cache schema of text datasets with a header, evicting least recently used schemas beyond the size limit.
+        """
+
+        if schema is None:
+            return
+
+        with self.lock:
+            self.schemas[header] = schema
+            self.schemas.move_to_end(header)
+
+            while len(self.schemas) > self.max_size:
+                self.schemas.popitem(last=False)
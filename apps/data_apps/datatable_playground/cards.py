@@ -1,7 +1,9 @@
 import sys
 import traceback
 
-from h2o_wave import Q, expando_to_dict, ui
+from h2o_wave import Q, data, expando_to_dict, ui
+
+import constants
 
 # App name
 app_name = 'Datatable Playground'
@@ -70,9 +72,19 @@ main = ui.form_card(
             ]
         ),
         ui.separator(label=''),
-        ui.table(name='data', columns=[], height='calc(100vh - 285px)')
+        ui.table(
+            name='data',
+            columns=[],
+            pagination=ui.table_pagination(total_rows=0, rows_per_page=constants.ROWS_PER_PAGE),
+            resettable=True,
+            events=constants.TABLE_EVENTS,
+            height='calc(100vh - 285px)'
+        )
     ],
-    commands=[ui.command(name='add_dataset', label='Add New Dataset', icon='Upload')]
+    commands=[
+        ui.command(name='add_dataset', label='Add New Dataset', icon='Upload'),
+        ui.command(name='profile', label='Profile Dataset', icon='BarChartVertical')
+    ]
 )
 
 # Dialog for adding new dataset
@@ -91,6 +103,82 @@ fallback = ui.form_card(
 )
 
 
+def dialog_progress(message: str, value: float) -> ui.Dialog:
+    """
+    Dialog for displaying progress of loading a dataset.
+    """
+
+    dialog = ui.dialog(
+        name='dialog_progress',
+        title='Loading Dataset',
+        items=[ui.progress(label=message, caption=f'{value:.0%}', value=value)],
+        blocking=True
+    )
+
+    return dialog
+
+
+def dialog_profile(profile: dict) -> ui.Dialog:
+    """
+    Dialog for displaying profile of each column of the dataset.
+    """
+
+    def format_value(value): return constants.NA_VALUE if value is None else \
+        f'{value:.4g}' if isinstance(value, float) else str(value)
+
+    items = [
+        ui.text(f'**Rows**: {profile["rows"]}'),
+        ui.table(
+            name='profile_columns',
+            columns=[
+                ui.table_column(name='column', label='Column', min_width='120px', link=False),
+                ui.table_column(name='type', label='Type', min_width='60px'),
+                ui.table_column(name='nas', label='Missing', data_type='number', min_width='70px'),
+                ui.table_column(name='distinct', label='Distinct', data_type='number', min_width='70px'),
+                ui.table_column(name='min', label='Min', min_width='100px'),
+                ui.table_column(name='max', label='Max', min_width='100px'),
+                ui.table_column(name='mean', label='Mean', min_width='70px'),
+                ui.table_column(name='top', label='Top Values', min_width='300px')
+            ],
+            rows=[ui.table_row(
+                name=column['name'],
+                cells=[
+                    column['name'],
+                    column['type'],
+                    str(column['nas']),
+                    str(column['distinct']),
+                    format_value(column['min']),
+                    format_value(column['max']),
+                    format_value(column['mean']),
+                    ', '.join([f'{format_value(value)} ({count})' for value, count in column['top']])
+                ]
+            ) for column in profile['columns']],
+            height='300px'
+        )
+    ]
+
+    # Histograms of numeric columns
+    for column in profile['columns']:
+        if column['histogram'] is not None:
+            items.append(ui.separator(label=column['name']))
+            items.append(ui.visualization(
+                plot=ui.plot([ui.mark(type='interval', x='=bin', y='=count', y_min=0)]),
+                data=data(fields=['bin', 'count'], rows=column['histogram'], pack=True),
+                height='150px'
+            ))
+
+    dialog = ui.dialog(
+        name='dialog_profile',
+        title='Dataset Profile',
+        items=items,
+        width='1000px',
+        closable=True,
+        events=['dismissed']
+    )
+
+    return dialog
+
+
 def crash_report(q: Q) -> ui.FormCard:
     """
     Card for capturing the stack trace and current application state, for error reporting.
@@ -0,0 +1,66 @@
+# Number of rows displayed in a single page of the table
+ROWS_PER_PAGE = 100
+
+# Maximum number of unique values in a string column to display it as filters
+MAX_FILTER_VALUES = 50
+
+# Events captured on the table, handled on the server
+TABLE_EVENTS = ['page_change', 'sort', 'search', 'filter', 'reset']
+
+# Value displayed in the table for missing values
+NA_VALUE = 'NA'
+
+# Maximum number of compiled queries cached
+QUERY_CACHE_SIZE = 1024
+
+# Maximum memory in bytes of query results cached
+QUERY_RESULTS_MEMORY = 1024 ** 3
+
+# Size in bytes of chunks of files read at once
+CHUNK_SIZE = 1024 ** 2
+
+# Maximum memory in bytes of datasets kept loaded when not used by any client
+DATASETS_MEMORY = 4 * 1024 ** 3
+
+# Time in seconds after which an idle client is released, along with the datasets it uses
+CLIENT_TIMEOUT = 60 * 60
+
+# Directory of datasets converted to jay format
+DATASETS_CACHE_DIR = 'datasets_cache'
+
+# Maximum total size in bytes of datasets converted to jay format, beyond which datasets not loaded are removed
+DATASETS_CACHE_SIZE = 20 * 1024 ** 3
+
+# Directory of scratch space for files downloaded by clients
+SCRATCH_DIR = 'scratch'
+
+# Maximum total size in bytes of files in scratch space, beyond which files not used by any client are evicted
+SCRATCH_QUOTA = 10 * 1024 ** 3
+
+# Time in seconds after which scratch space of an idle client is released
+SCRATCH_CLIENT_TIMEOUT = 60 * 60
+
+# Directory of uploaded datasets in scratch space, stored once by the fingerprint of their contents
+UPLOADS_DIR = 'scratch/uploads'
+
+# Interval in seconds between updates of progress
+PROGRESS_INTERVAL = 0.5
+
+# Number of most frequent values of each column in the profile
+PROFILE_TOP_VALUES = 5
+
+# Number of bins of histograms of numeric columns in the profile
+PROFILE_HISTOGRAM_BINS = 10
+
+# Suffixes of text datasets, read with the schema of datasets with the same header
+TEXT_SUFFIXES = ['.csv', '.txt']
+
+# Detect separator, header and types of columns of text datasets not read before, else read all columns as strings
+SNIFF_SCHEMA = True
+
+# Separators of text datasets recognized in headers, and the one used when not detecting it
+SEPARATORS = [',', '\t', ';', '|']
+DEFAULT_SEPARATOR = ','
+
+# Maximum number of schemas of text datasets remembered by their header
+SCHEMA_CACHE_SIZE = 1024
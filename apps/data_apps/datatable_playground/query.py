@@ -0,0 +1,271 @@
+import ast
+import operator
+from functools import lru_cache
+from typing import Callable
+
+import datatable as dt
+
+import constants
+
+# Names referring to the dataset in a query
+DATA_NAMES = ['data', 'df', 'DT']
+
+# Methods of the dataset allowed in a query
+FRAME_METHODS = ['head', 'tail', 'sort']
+
+# Functions of datatable allowed in a query, as dt.<name>
+FUNCTIONS = [
+    'abs', 'as_type', 'by', 'count', 'countna', 'cumcount', 'cummax', 'cummin', 'cumprod', 'cumsum', 'cut', 'exp',
+    'fillna', 'first', 'ifelse', 'isna', 'last', 'log', 'log10', 'max', 'mean', 'median', 'min', 'ngroup', 'nunique',
+    'prod', 'qcut', 'rowall', 'rowany', 'rowcount', 'rowfirst', 'rowlast', 'rowmax', 'rowmean', 'rowmin', 'rowsd',
+    'rowsum', 'sd', 'shift', 'sort', 'sum'
+]
+
+# Functions of datatable's regex module allowed in a query, as dt.re.<name>
+REGEX_FUNCTIONS = ['match']
+
+# Types of datatable allowed in a query, as dt.<name>
+TYPES = ['bool8', 'float32', 'float64', 'int8', 'int16', 'int32', 'int64', 'str32', 'str64', 'time64']
+
+# Operators allowed in a query
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+    ast.BitAnd: operator.and_,
+    ast.BitOr: operator.or_,
+    ast.BitXor: operator.xor,
+    ast.LShift: operator.lshift,
+    ast.RShift: operator.rshift
+}
+UNARY_OPERATORS = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+    ast.Invert: operator.invert
+}
+COMPARISON_OPERATORS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge
+}
+
+
+class QueryError(Exception):
+    """
+    Error for queries that are invalid or not allowed.
+    """
+
+
+def parse_query(query: str) -> ast.Expression:
+    """
+    Parse query into its syntax tree.
+    """
+
+    try:
+        return ast.parse(query.strip(), mode='eval')
+    except SyntaxError as error:
+        raise QueryError(f'Invalid syntax: {error.msg}')
+
+
+@lru_cache(maxsize=constants.QUERY_CACHE_SIZE)
+def normalize_query(query: str) -> str:
+    """
+    Normalize query by its syntax, ignoring whitespace, quotes and the name used for the dataset.
+    """
+
+    tree = parse_query(query=query)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id in DATA_NAMES:
+            node.id = DATA_NAMES[0]
+
+    return ast.unparse(tree)
+
+
+@lru_cache(maxsize=constants.QUERY_CACHE_SIZE)
+def compile_query(query: str) -> list[tuple[str, Callable[[dt.Frame], dt.Frame]]]:
+    """
+    Compile query into its chain of datatable operations on a dataset, each with the query up to that operation.
+    Only subsets, selections, groupings and sorts of the dataset with datatable expressions are allowed, so arbitrary
+    code is never executed. Compiled queries are cached and shared across clients.
+    """
+
+    return compile_operations(node=parse_query(query=query).body)
+
+
+def apply_query(query: str, data: dt.Frame, fingerprint: str, results) -> tuple[dt.Frame, tuple]:
+    """
+    Apply query on a dataset, resuming from the longest chain of its operations with a cached result.
+    Results of each operation are cached, so refining a query or backing up one operation only runs what changed.
+    Returns the result and its key in the cache of results, None if the query is the dataset itself.
+    """
+
+    operations = compile_query(query=normalize_query(query=query))
+
+    # Find the longest chain of operations already applied on the same dataset
+    start = 0
+    if operations:
+        i, result = results.find([(fingerprint, chain) for chain, _ in operations])
+        if result is not None:
+            data, start = result, i + 1
+
+    # Apply the remaining operations
+    for chain, operation in operations[start:]:
+        data = operation(data)
+
+        if not isinstance(data, dt.Frame):
+            raise QueryError('Query must result in a dataset')
+
+        results.put((fingerprint, chain), data)
+
+    return data, (fingerprint, operations[-1][0]) if operations else None
+
+
+def compile_operations(node: ast.expr) -> list[tuple[str, Callable[[dt.Frame], dt.Frame]]]:
+    """
+    Compile a chain of operations on the dataset, eg: data[dt.f.price > 1, :].head(5).
+    """
+
+    # Dataset itself
+    if isinstance(node, ast.Name):
+        if node.id not in DATA_NAMES:
+            raise QueryError(f'Unknown name "{node.id}", refer the dataset using {", ".join(DATA_NAMES)}')
+
+        return []
+
+    # Subset of dataset, eg: data[i, j, dt.by(...), dt.sort(...)]
+    if isinstance(node, ast.Subscript):
+        operations = compile_operations(node=node.value)
+        elements = node.slice.elts if isinstance(node.slice, ast.Tuple) else [node.slice]
+        args = tuple(compile_expression(node=element) for element in elements)
+        operations.append((ast.unparse(node), lambda data: data[args]))
+
+        return operations
+
+    # Method of dataset, eg: data.head(5)
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+        if node.func.attr not in FRAME_METHODS:
+            raise QueryError(f'Method "{node.func.attr}" is not allowed, use one of {", ".join(FRAME_METHODS)}')
+
+        operations = compile_operations(node=node.func.value)
+        method = node.func.attr
+        args = [compile_expression(node=arg) for arg in node.args]
+        kwargs = {keyword.arg: compile_expression(node=keyword.value) for keyword in node.keywords}
+        operations.append((ast.unparse(node), lambda data: getattr(data, method)(*args, **kwargs)))
+
+        return operations
+
+    raise QueryError('Query must be an operation on the dataset, eg: data[dt.f.price > 1, :]')
+
+
+def compile_expression(node: ast.expr):
+    """
+    Compile an expression used within an operation into datatable objects.
+    """
+
+    # Literals, eg: 1, 'Fruit', None
+    if isinstance(node, ast.Constant):
+        if node.value is not None and not isinstance(node.value, (bool, int, float, str)):
+            raise QueryError(f'Value {node.value!r} is not allowed')
+
+        return node.value
+
+    # Slices, eg: 10:20
+    if isinstance(node, ast.Slice):
+        return slice(*[None if part is None else compile_expression(node=part) for part in
+                       [node.lower, node.upper, node.step]])
+
+    # Lists of columns, eg: ['user', dt.f.price]
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return [compile_expression(node=element) for element in node.elts]
+
+    # Named columns, eg: {'total': dt.sum(dt.f.price)}
+    if isinstance(node, ast.Dict):
+        if not all(isinstance(key, ast.Constant) and isinstance(key.value, str) for key in node.keys):
+            raise QueryError('Names of columns must be strings')
+
+        return {key.value: compile_expression(node=value) for key, value in zip(node.keys, node.values)}
+
+    # Columns by name, eg: dt.f.price
+    if isinstance(node, ast.Attribute) and is_namespace(node=node.value, path=['dt', 'f']):
+        return dt.f[node.attr]
+
+    # Columns by name, position or slice, eg: dt.f['price'], dt.f[0], dt.f[:]
+    if isinstance(node, ast.Subscript) and is_namespace(node=node.value, path=['dt', 'f']):
+        return dt.f[compile_expression(node=node.slice)]
+
+    # Types, eg: dt.str32
+    if isinstance(node, ast.Attribute) and is_namespace(node=node.value, path=['dt']) and node.attr in TYPES:
+        return getattr(dt, node.attr)
+
+    # Functions, eg: dt.mean(dt.f.price), dt.re.match(dt.f.user, 'U.*')
+    if isinstance(node, ast.Call):
+        function = compile_function(node=node.func)
+        args = [compile_expression(node=arg) for arg in node.args]
+        kwargs = {keyword.arg: compile_expression(node=keyword.value) for keyword in node.keywords}
+
+        return function(*args, **kwargs)
+
+    # Operations, eg: dt.f.price * dt.f.quantity
+    if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+        left, right = compile_expression(node=node.left), compile_expression(node=node.right)
+
+        # Operations on literals alone are not allowed, eg: 10 ** 10 ** 10
+        if not isinstance(left, dt.FExpr) and not isinstance(right, dt.FExpr):
+            raise QueryError(f'Operation "{ast.unparse(node)}" must involve columns')
+
+        return BINARY_OPERATORS[type(node.op)](left, right)
+
+    # Operations, eg: -dt.f.price, ~dt.isna(dt.f.age)
+    if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+        return UNARY_OPERATORS[type(node.op)](compile_expression(node=node.operand))
+
+    # Comparisons, eg: dt.f.price > 1
+    if isinstance(node, ast.Compare) and len(node.ops) == 1 and type(node.ops[0]) in COMPARISON_OPERATORS:
+        return COMPARISON_OPERATORS[type(node.ops[0])](
+            compile_expression(node=node.left),
+            compile_expression(node=node.comparators[0])
+        )
+
+    if isinstance(node, (ast.BoolOp, ast.Compare)):
+        raise QueryError('Combine conditions using &, | and ~ with parentheses, eg: (dt.f.price > 1) & (dt.f.age < 30)')
+
+    raise QueryError(f'Expression "{ast.unparse(node)}" is not allowed')
+
+
+def compile_function(node: ast.expr) -> Callable:
+    """
+    Compile an allowed function of datatable.
+    """
+
+    if isinstance(node, ast.Attribute) and is_namespace(node=node.value, path=['dt']) and node.attr in FUNCTIONS:
+        function = getattr(dt, node.attr, None)
+    elif isinstance(node, ast.Attribute) and is_namespace(node=node.value, path=['dt', 're']) and \
+            node.attr in REGEX_FUNCTIONS:
+        function = getattr(dt.re, node.attr, None)
+    else:
+        function = None
+
+    if function is None:
+        raise QueryError(f'Function "{ast.unparse(node)}" is not allowed')
+
+    return function
+
+
+def is_namespace(node: ast.expr, path: list[str]) -> bool:
+    """
+    Check if node refers to a namespace, eg: dt.f for path ['dt', 'f'].
+    """
+
+    for name in reversed(path[1:]):
+        if not isinstance(node, ast.Attribute) or node.attr != name:
+            return False
+        node = node.value
+
+    return isinstance(node, ast.Name) and node.id == path[0]
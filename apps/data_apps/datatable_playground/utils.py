@@ -1,19 +1,40 @@
-import re
+import hashlib
+import logging
+import os
+import threading
+from functools import reduce
+from operator import and_, or_
+from pathlib import Path
 
 import datatable as dt
 from h2o_wave import ui
 
+import constants
 
-def prepare_query(query: str) -> str:
+# Types of columns that fread can be told to read a column as
+FREAD_STYPES = [
+    dt.stype.bool8, dt.stype.int32, dt.stype.int64, dt.stype.float32, dt.stype.float64, dt.stype.str32, dt.stype.str64
+]
+# Progress of reading datasets per thread, as datatable reports it in the thread reading
+progress_local = threading.local()
+
+
+def update_progress(progress: dict, message: str, value: float):
     """
-    Prepare query in clean syntax.
+    Update progress of a task running in the background, if tracked.
     """
 
-    query = re.sub('data', 'q.client.data', query)
-    query = re.sub('df', 'q.client.data', query)
-    query = re.sub('DT', 'q.client.data', query)
+    if progress is not None:
+        progress['message'] = message
+        progress['value'] = value
 
-    return query
+
+def update_read_progress(status):
+    """
+    Update progress of reading a dataset in the current thread, as reported by datatable.
+    """
+
+    update_progress(progress=getattr(progress_local, 'progress', None), message='Parsing dataset', value=status.progress)
 
 
 def create_choices_from_list(values: list) -> list[ui.Choice]:
@@ -24,21 +45,312 @@ def create_choices_from_list(values: list) -> list[ui.Choice]:
     return [ui.choice(name=str(value), label=str(value)) for value in values]
 
 
+def fingerprint_file(path: str, progress: dict = None) -> str:
+    """
+    Create fingerprint of a file from its contents.
+    """
+
+    size = max(os.path.getsize(path), 1)
+
+    fingerprint = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(constants.CHUNK_SIZE), b''):
+            fingerprint.update(chunk)
+            update_progress(progress=progress, message='Reading dataset', value=file.tell() / size)
+
+    return fingerprint.hexdigest()
+
+
+def store_upload(path: str) -> tuple[str, str]:
+    """
+    Store uploaded dataset by the fingerprint of its contents, keeping a single copy of repeatedly uploaded datasets.
+    Returns the path of the stored dataset and its fingerprint.
+    """
+
+    fingerprint = fingerprint_file(path=path)
+
+    path_stored = Path(constants.UPLOADS_DIR) / f'{fingerprint}{Path(path).suffix}'
+    if path_stored.exists():
+        os.remove(path)
+    else:
+        path_stored.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(path, path_stored)
+
+    return str(path_stored), fingerprint
+
+
+def read_header(path: str) -> bytes:
+    """
+    Read header of text dataset, its first line.
+    """
+
+    with open(path, 'rb') as file:
+        return file.readline().rstrip(b'\r\n')
+
+
+def create_schema(header: bytes, data: dt.Frame) -> dict:
+    """
+    Create schema of text dataset from its header, with its separator and types of columns (None if the header is not
+    recognized). Types that fread cannot be told to read are detected on every read.
+    """
+
+    text = header.decode(errors='replace')
+
+    for sep in constants.SEPARATORS:
+        if text.split(sep) == list(data.names):
+            return {
+                'sep': sep,
+                'columns': [(name, stype if stype in FREAD_STYPES else ...) for name, stype in zip(data.names, data.stypes)]
+            }
+
+    return None
+
+
+def read_text_dataset(path: str, schemas) -> dt.Frame:
+    """
+    Read text dataset with the separator and types of columns of datasets with the same header, if read before.
+    Without a schema, or if the dataset does not fit it, they are detected by fread and remembered for later datasets,
+    unless detection is disabled in which case columns of unknown type are read as strings.
+    """
+
+    header = read_header(path=path)
+    schema = schemas.get(header)
+
+    if schema is not None:
+        columns = schema['columns']
+        if not constants.SNIFF_SCHEMA:
+            columns = [(name, dt.stype.str32 if stype is ... else stype) for name, stype in columns]
+
+        try:
+            return dt.fread(path, sep=schema['sep'], header=True, columns=columns)
+        except IOError:
+            if not constants.SNIFF_SCHEMA:
+                raise
+            logging.info('Dataset does not fit the schema of its header, detecting schema')
+
+    if not constants.SNIFF_SCHEMA:
+        return dt.fread(path, sep=constants.DEFAULT_SEPARATOR, header=True, columns={...: dt.stype.str32})
+
+    data = dt.fread(path)
+    schemas.put(header, create_schema(header=header, data=data))
+
+    return data
+
+
+def read_dataset(path: str, fingerprint: str, schemas, progress: dict = None) -> dt.Frame:
+    """
+    Read dataset, converting it once to datatable's binary jay format which is memory-mapped on later reads.
+    Text datasets are read with the schema of datasets with the same header, if read before.
+    """
+
+    if Path(path).suffix == '.jay':
+        return dt.fread(path)
+
+    path_jay = Path(constants.DATASETS_CACHE_DIR) / f'{fingerprint}.jay'
+
+    if not path_jay.exists():
+        path_jay.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temporary file first so that a partially written file is never read
+        path_jay_tmp = path_jay.with_suffix('.jay.tmp')
+        progress_local.progress = progress
+        try:
+            if Path(path).suffix in constants.TEXT_SUFFIXES:
+                data = read_text_dataset(path=path, schemas=schemas)
+            else:
+                data = dt.fread(path)
+            data.to_jay(str(path_jay_tmp))
+        finally:
+            progress_local.progress = None
+        os.replace(path_jay_tmp, path_jay)
+
+    # Mark the converted dataset as recently used
+    os.utime(path_jay)
+
+    return dt.fread(str(path_jay))
+
+
+def evict_cached_datasets(keep: set[str]):
+    """
+    Remove least recently used datasets converted to jay format beyond the size limit, except those with the
+    fingerprints kept.
+    """
+
+    files = []
+    for path in Path(constants.DATASETS_CACHE_DIR).glob('*.jay'):
+        try:
+            files.append((path, path.stat()))
+        except FileNotFoundError:
+            pass
+
+    size = sum(stat.st_size for _, stat in files)
+    for path, stat in sorted(files, key=lambda file: file[1].st_mtime):
+        if size <= constants.DATASETS_CACHE_SIZE:
+            break
+
+        if path.stem not in keep:
+            logging.info(f'Evicting {path} from datasets cache')
+            path.unlink(missing_ok=True)
+            size -= stat.st_size
+
+
+def create_column_filters(data: dt.Frame, col: str) -> list[str]:
+    """
+    Create filter values of a column, only for string columns with few unique values (None otherwise).
+    """
+
+    if data[col].ltypes[0] != dt.ltype.str or data[:, dt.nunique(dt.f[col])][0, 0] > constants.MAX_FILTER_VALUES:
+        return None
+
+    return [str(value) for value in dt.unique(data[col]).to_list()[0] if value is not None]
+
+
 def create_table_columns(data: dt.Frame) -> list[ui.TableColumn]:
     """
     Create columns of data in Wave's TableColumn format.
     """
 
+    columns = []
+    for col in data.names:
+        filters = create_column_filters(data=data, col=col)
+        columns.append(ui.table_column(
+            name=str(col),
+            label=str(col),
+            sortable=True,
+            searchable=True,
+            filterable=filters is not None,
+            link=False,
+            filters=filters
+        ))
+
+    return columns
+
+
+def create_table_pagination(data: dt.Frame) -> ui.TablePagination:
+    """
+    Create pagination of data in Wave's TablePagination format.
+    """
+
+    return ui.table_pagination(total_rows=data.nrows, rows_per_page=constants.ROWS_PER_PAGE)
+
+
+def create_table_cells(data: dt.Frame) -> list[tuple[str]]:
+    """
+    Create cells of data as strings, converting each column at once instead of each row.
+    """
+
+    # Floats, dates and other types are formatted natively by datatable, with missing values as None
+    columns = data[:, dt.as_type(dt.f[:], dt.str32)].to_list()
+    columns = [[constants.NA_VALUE if value is None else value for value in column] for column in columns]
+
+    return list(zip(*columns))
+
+
+def create_table_rows(data: dt.Frame, offset: int = 0) -> list[ui.TableRow]:
+    """
+    Create rows of a single page of data in Wave's TableRow format.
+    """
+
+    page = data[offset:offset + constants.ROWS_PER_PAGE, :]
+
     return [
-        ui.table_column(name=str(col), label=str(col), link=False) for col in data.names
+        ui.table_row(name=str(offset + i), cells=list(cells)) for i, cells in enumerate(create_table_cells(data=page))
     ]
 
 
-def create_table_rows(data: dt.Frame) -> list[ui.TableRow]:
+def create_search_pattern(search: str) -> str:
     """
-    Create rows of data in Wave's TableRow format.
+    Create a case-insensitive regex pattern matching values containing the search term.
     """
 
+    pattern = ''
+    for char in search:
+        if char.lower() != char.upper():
+            pattern += f'[{char.lower()}{char.upper()}]'
+        elif char in r'\^$.|?*+()[]{}':
+            pattern += f'\\{char}'
+        else:
+            pattern += char
+
+    return f'.*{pattern}.*'
+
+
+def create_table_view(data: dt.Frame, sort: dict = None, search: str = None, filters: dict = None) -> dt.Frame:
+    """
+    Apply sort, search and filters of the table on data as datatable expressions.
+    """
+
+    conditions = []
+
+    # Keep rows matching any of the selected values of each filtered column
+    if filters:
+        for col, values in filters.items():
+            if values:
+                conditions.append(reduce(or_, [dt.f[col] == value for value in values]))
+
+    # Keep rows with any column containing the search term
+    if search:
+        pattern = create_search_pattern(search=search)
+        conditions.append(dt.rowany(*[dt.re.match(dt.as_type(dt.f[col], dt.str32), pattern) for col in data.names]))
+
+    if conditions:
+        data = data[reduce(and_, conditions), :]
+
+    # Sort rows by columns, with True as descending order
+    if sort:
+        data = data[:, :, dt.sort(*sort.keys(), reverse=list(sort.values()))]
+
+    return data
+
+
+def create_profile(data: dt.Frame) -> dict:
+    """
+    Create profile of each column of data, computed with datatable's reducers.
+    """
+
+    names = data.names
+    numeric = [col for col, ltype in zip(names, data.ltypes) if ltype in [dt.ltype.int, dt.ltype.real]]
+    ordered = numeric + [col for col, ltype in zip(names, data.ltypes) if ltype == dt.ltype.time]
+
+    # Each reducer is computed for all its columns at once
+    nas = data[:, dt.countna(dt.f[:])].to_tuples()[0] if names else []
+    distincts = data[:, dt.nunique(dt.f[:])].to_tuples()[0] if names else []
+    mins = dict(zip(ordered, data[:, dt.min(dt.f[ordered])].to_tuples()[0])) if ordered else {}
+    maxs = dict(zip(ordered, data[:, dt.max(dt.f[ordered])].to_tuples()[0])) if ordered else {}
+    means = dict(zip(numeric, data[:, dt.mean(dt.f[numeric])].to_tuples()[0])) if numeric else {}
+
+    columns = []
+    for col, ltype, na, distinct in zip(names, data.ltypes, nas, distincts):
+        top = data[:, dt.count(), dt.by(col)][:, :, dt.sort(-dt.f.count)].head(constants.PROFILE_TOP_VALUES)
+
+        columns.append({
+            'name': col,
+            'type': ltype.name,
+            'nas': na,
+            'distinct': distinct,
+            'min': mins.get(col),
+            'max': maxs.get(col),
+            'mean': means.get(col),
+            'top': top.to_tuples(),
+            'histogram': create_histogram(data=data, col=col, low=mins.get(col), high=maxs.get(col))
+            if col in numeric else None
+        })
+
+    return {'rows': data.nrows, 'columns': columns}
+
+
+def create_histogram(data: dt.Frame, col: str, low: float, high: float) -> list[tuple[str, int]]:
+    """
+    Create histogram of a numeric column as counts of equal width bins, None if the column has no values.
+    """
+
+    if low is None:
+        return None
+
+    bins = data[:, {'bin': dt.cut(dt.f[col], nbins=constants.PROFILE_HISTOGRAM_BINS)}]
+    counts = dict(bins[:, dt.count(), dt.by('bin')].to_tuples())
+    width = (high - low) / constants.PROFILE_HISTOGRAM_BINS
+
     return [
-        ui.table_row(name=str(i), cells=[str(value) for value in data[i, :].to_tuples()[0]]) for i in range(data.nrows)
+        (f'{low + i * width:.4g}', counts.get(i, 0)) for i in range(constants.PROFILE_HISTOGRAM_BINS)
     ]
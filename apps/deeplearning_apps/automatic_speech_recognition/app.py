@@ -1,4 +1,5 @@
 import logging
+import tempfile
 
 from h2o_wave import Q, main, app, copy_expando, handle_on, on
 from transformers import AutoModelForCTC, Wav2Vec2Processor
@@ -144,9 +145,14 @@ async def audio_inference(q: Q):
 
     logging.info('Inferencing recorded audio')
 
-    audio_path = await q.site.download(q.events.audio.captured, '.')
-
-    q.client.transcription = generate_transcription(audio_path=audio_path, model=q.app.model, processor=q.app.processor)
+    # Download audio into a temporary directory, removed once transcribed
+    with tempfile.TemporaryDirectory() as path_dir:
+        audio_path = await q.site.download(q.events.audio.captured, path_dir)
+        q.client.transcription = generate_transcription(
+            audio_path=audio_path,
+            model=q.app.model,
+            processor=q.app.processor
+        )
 
     q.page['asr'] = cards.asr(audio_path=q.events.audio.captured, transcription=q.client.transcription)
 
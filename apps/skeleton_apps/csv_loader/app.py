@@ -1,10 +1,20 @@
+import asyncio
+import hashlib
 import logging
+import os
+import shutil
+import tempfile
 from pathlib import Path
+from uuid import uuid4
 
 import datatable as dt
 from h2o_wave import Q, main, app, copy_expando, handle_on, on
 
+import cache
 import cards
+import constants
+import scratch
+import utils
 
 # Set up logging
 logging.basicConfig(format='%(levelname)s:\t[%(asctime)s]\t%(message)s', level=logging.INFO)
@@ -21,6 +31,10 @@ async def serve(q: Q):
         if not q.app.initialized:
             await initialize_app(q)
 
+        # Mark the client as active, so that its scratch space is not released as idle
+        if q.client.initialized:
+            q.app.scratch.touch(q.client.scratch_id)
+
         # Initialize the client if not already
         if not q.client.initialized:
             await initialize_client(q)
@@ -29,6 +43,14 @@ async def serve(q: Q):
         elif q.args.theme_dark is not None and q.args.theme_dark != q.client.theme_dark:
             await update_theme(q)
 
+        # Update table if paged, sorted, searched, filtered or reset
+        elif q.events.data:
+            await update_table(q)
+
+        # Update table if grouping is changed
+        elif q.args.group_by is not None and q.args.group_by != q.client.table_group_by:
+            await update_group_by(q)
+
         # Delegate query to query handlers
         elif await handle_on(q):
             pass
@@ -54,6 +76,19 @@ async def initialize_app(q: Q):
     # Upload default data
     q.app.path_default_data, = await q.site.upload(files=['waveton_sample.csv'])
 
+    # Scratch space for files downloaded by clients
+    q.app.scratch = scratch.ScratchSpace(
+        root=constants.SCRATCH_DIR,
+        quota=constants.SCRATCH_QUOTA,
+        timeout=constants.SCRATCH_CLIENT_TIMEOUT
+    )
+
+    # Cache of data of uploaded files shared across clients, for repeated uploads of the same file
+    q.app.frames = cache.FrameCache(max_memory=constants.FRAMES_MEMORY)
+
+    # Cache of schemas of csv files shared across clients, for later files with the same header
+    q.app.schemas = cache.SchemaCache(max_size=constants.SCHEMA_CACHE_SIZE)
+
     q.app.initialized = True
 
 
@@ -66,6 +101,9 @@ async def initialize_client(q: Q):
 
     # Set initial argument values
     q.client.theme_dark = True
+    q.client.stream_id = None
+    q.client.scratch_id = str(uuid4())
+    q.client.export_url = None
 
     # Add layouts, header and footer
     q.page['meta'] = cards.meta
@@ -112,18 +150,404 @@ async def update_data(q: Q):
 
     logging.info('Updating data from csv file')
 
-    # Download data
-    path_data = await q.site.download(q.args.upload[0], '.')
-    data = dt.fread(path_data)
-    name = Path(path_data).name
+    # Download data, reusing the data of a file already uploaded
+    path_data, fingerprint = await download_data(q, url=q.args.upload[0])
+    name = Path(q.args.upload[0]).name
 
-    # Update table with data
     q.page['upload'] = cards.upload(path_default_data=q.app.path_default_data)
-    q.page['table'] = cards.table(name=name, data=data)
+
+    # Stop streaming any previous file
+    q.client.stream_id = None
+
+    data = None if fingerprint is None else q.app.frames.get(fingerprint)
+    paginated = os.path.getsize(path_data) >= constants.STREAMING_MIN_SIZE
+
+    if data is not None:
+        logging.info('Reusing data of previously uploaded csv file')
+
+        if paginated:
+            initialize_table(q, name=name)
+            q.client.data = data
+            q.client.data_view = data
+            q.page['table'] = cards.table_paginated(
+                name=name,
+                data=q.client.data,
+                data_view=q.client.data_view,
+                columns=await q.run(cards.table_columns, data=q.client.data_view),
+                group_by=q.client.table_group_by
+            )
+        else:
+            q.page['table'] = cards.table(name=name, data=data)
+
+        await q.page.save()
+    elif paginated:
+        await stream_data(q, path_data=path_data, name=name, fingerprint=fingerprint)
+    else:
+        # Read data with the schema of files with the same header
+        header = utils.read_header(path=path_data)
+        data = utils.read_csv(schema=q.app.schemas.get(header), file=path_data)
+        update_schema(q, header=header, data=data)
+        q.app.frames.put(fingerprint, data)
+
+        # Update table with data
+        q.page['table'] = cards.table(name=name, data=data)
+
+        await q.page.save()
+
+
+async def download_data(q: Q, url: str) -> tuple[str, str]:
+    """
+    Download uploaded file into the store of uploads, keeping a single copy of repeatedly uploaded files.
+    Files streamed are fingerprinted while they are read and stored then, unless a sample of the file matches a file
+    uploaded before. Returns the path of the file and its fingerprint, None if not known yet.
+    """
+
+    # Download into the scratch space of the client, so that files of the same name uploaded together do not collide
+    path_data = await q.site.download(url, q.app.scratch.client_dir(q.client.scratch_id))
+
+    if os.path.getsize(path_data) >= constants.STREAMING_MIN_SIZE:
+        sample = await q.run(utils.sample_file, path=path_data)
+        if q.app.frames.find(sample) is None:
+            q.app.scratch.add(path_data, client=q.client.scratch_id)
+            return path_data, None
+
+    path_stored, fingerprint = await q.run(utils.store_upload, path=path_data)
+    q.app.scratch.add(path_stored, client=q.client.scratch_id)
+
+    return path_stored, fingerprint
+
+
+def initialize_table(q: Q, name: str):
+    """
+    Initialize paginated table of data, resetting its page, sort, search, filters and grouping.
+    """
+
+    q.client.name = name
+    q.client.data = None
+    q.client.pending_chunks = []
+    q.client.combining = asyncio.Lock()
+    q.client.loading = False
+    q.client.table_offset = 0
+    q.client.table_sort = None
+    q.client.table_search = None
+    q.client.table_filters = None
+    q.client.table_group_by = constants.NO_GROUP_BY
+
+
+async def stream_data(q: Q, path_data: str, name: str, fingerprint: str = None):
+    """
+    Stream data from csv file in chunks, displaying the first page as soon as it is parsed.
+    The file is fingerprinted while it is read, if its fingerprint is not known.
+    """
+
+    logging.info('Streaming data from csv file')
+
+    stream_id = str(uuid4())
+    q.client.stream_id = stream_id
+
+    initialize_table(q, name=name)
+    q.client.loading = True
+
+    # Read data with the schema of files with the same header
+    header = utils.read_header(path=path_data)
+    hash_data = hashlib.sha256() if fingerprint is None else None
+    chunks = utils.read_csv_chunks(path=path_data, schema=q.app.schemas.get(header), fingerprint=hash_data)
+
+    while True:
+        # Parse next chunk in the background
+        chunk = await q.run(next, chunks, None)
+
+        # Stop streaming if another file is uploaded
+        if q.client.stream_id != stream_id:
+            chunks.close()
+            return
+
+        if chunk is None:
+            break
+
+        if q.client.data is None:
+            # Display first page
+            columns = await q.run(cards.table_columns, data=chunk)
+
+            # Stop streaming if another file is uploaded
+            if q.client.stream_id != stream_id:
+                chunks.close()
+                return
+
+            q.client.data = chunk
+            q.client.data_view = chunk
+            q.page['table'] = cards.table_paginated(
+                name=name,
+                data=q.client.data,
+                data_view=q.client.data_view,
+                columns=columns,
+                group_by=q.client.table_group_by,
+                loading=True
+            )
+        else:
+            q.client.pending_chunks.append(chunk)
+
+            # Chunks are appended to the data once they hold as many rows as the data, rather than one by one, so that
+            # each row is copied a bounded number of times however large the file is
+            if sum(pending.nrows for pending in q.client.pending_chunks) >= q.client.data.nrows:
+                await combine_chunks(q)
+                await update_view(q)
+
+                # Stop streaming if another file is uploaded
+                if q.client.stream_id != stream_id:
+                    chunks.close()
+                    return
+
+                update_table_rows(q)
+
+            # Update row count
+            q.page['table'].items[0].text_l.content = cards.table_caption(
+                name=name,
+                n_rows=count_rows(q),
+                loading=True
+            )
+
+        await q.page.save()
+
+    logging.info('Streamed data from csv file')
+
+    await combine_chunks(q)
+    await update_view(q)
+
+    # Stop if another file is uploaded
+    if q.client.stream_id != stream_id:
+        return
+
+    update_table_rows(q)
+
+    # Data of the file, kept even if another file is uploaded while it is stored
+    data = q.client.data
+    q.client.loading = False
+    update_schema(q, header=header, data=data)
+
+    # Store the file by its fingerprint once fully read, so that its data is reused when uploaded again
+    if hash_data is not None:
+        path_stored, fingerprint = await q.run(utils.store_upload, path=path_data, fingerprint=hash_data.hexdigest())
+        q.app.scratch.remove(path_data)
+        q.app.scratch.add(path_stored, client=q.client.scratch_id)
+        path_data = path_stored
+    sample = await q.run(utils.sample_file, path=path_data)
+    q.app.frames.put(fingerprint, data, sample=sample)
+
+    # Filters of columns are created with values of all rows in the background
+    columns = await q.run(cards.table_columns, data=q.client.data_view)
+
+    # Stop if another file is uploaded
+    if q.client.stream_id != stream_id:
+        return
+
+    # Update filters of columns, and allow exporting all rows
+    q.page['table'].items[0].text_l.content = cards.table_caption(name=name, n_rows=data.nrows)
+    q.page['table'].items[1].inline.items[2].button.disabled = False
+    q.page['table'].items[2].table.columns = columns
 
     await q.page.save()
 
 
+async def combine_chunks(q: Q) -> bool:
+    """
+    Append chunks parsed since they were last combined to the data in the background, copying the data once.
+    Returns whether any chunks were appended.
+    """
+
+    # Clients combine chunks one at a time, so that chunks are never appended to stale data
+    async with q.client.combining:
+        if not q.client.pending_chunks:
+            return False
+
+        data = q.client.data
+        chunks = q.client.pending_chunks
+        q.client.pending_chunks = []
+        combined = await q.run(dt.rbind, data, *chunks, force=True)
+
+        # Data is discarded if another file is loaded meanwhile
+        if q.client.data is not data:
+            return False
+
+        q.client.data = combined
+
+    return True
+
+
+def count_rows(q: Q) -> int:
+    """
+    Count rows of the data, including chunks not yet appended to it.
+    """
+
+    return q.client.data.nrows + sum(chunk.nrows for chunk in q.client.pending_chunks)
+
+
+def update_schema(q: Q, header: bytes, data: dt.Frame):
+    """
+    Update schema of csv files with the header of data, if detected.
+    """
+
+    if constants.SNIFF_SCHEMA:
+        q.app.schemas.put(header, utils.create_schema(header=header, data=data))
+
+
+async def update_view(q: Q):
+    """
+    Update sorted, searched, filtered and grouped view of data in the background.
+    """
+
+    data = q.client.data
+    data_view = await q.run(
+        utils.create_view,
+        data=data,
+        sort=q.client.table_sort,
+        search=q.client.table_search,
+        filters=q.client.table_filters,
+        group_by=None if q.client.table_group_by == constants.NO_GROUP_BY else q.client.table_group_by
+    )
+
+    # View is discarded if the data changed meanwhile
+    if q.client.data is data:
+        q.client.data_view = data_view
+
+
+def update_table_rows(q: Q):
+    """
+    Update table rows with the current page of the view.
+    """
+
+    q.page['table'].items[2].table.pagination = cards.table_pagination(data=q.client.data_view)
+    q.page['table'].items[2].table.rows = cards.table_rows(data=q.client.data_view, offset=q.client.table_offset)
+
+
+async def update_table(q: Q):
+    """
+    Update table based on table events.
+    """
+
+    logging.info('Updating table')
+
+    table_event = q.events.data
+
+    if table_event.download:
+        # Data is only exported once all rows are loaded, as with the export button
+        if q.client.loading:
+            logging.info('Not exporting data while loading')
+        else:
+            await export_view(q, export_format='csv')
+        return
+
+    # Rows parsed since the view was last updated are included in the view
+    combined = await combine_chunks(q)
+
+    if table_event.reset:
+        q.client.table_sort = None
+        q.client.table_search = None
+        q.client.table_filters = None
+
+    if table_event.sort:
+        q.client.table_sort = table_event.sort
+
+    if table_event.search is not None:
+        # Search is sent either as the term or as the term with searchable columns
+        search = table_event.search
+        q.client.table_search = search.get('value') if isinstance(search, dict) else search
+
+    if table_event.filter:
+        q.client.table_filters = table_event.filter
+
+    if table_event.page_change:
+        q.client.table_offset = table_event.page_change.get('offset', 0)
+        if combined:
+            await update_view(q)
+    else:
+        # Sort, search and filters are applied on the data on the server, and the first page displayed
+        q.client.table_offset = 0
+        await update_view(q)
+
+    update_table_rows(q)
+
+    await q.page.save()
+
+
+async def update_group_by(q: Q):
+    """
+    Update grouping of table rows.
+    """
+
+    logging.info('Updating grouping of table')
+
+    q.client.table_group_by = q.args.group_by
+    q.client.table_offset = 0
+    await combine_chunks(q)
+    await update_view(q)
+
+    # Columns change with grouping, and are created in the background
+    data_view = q.client.data_view
+    columns = await q.run(cards.table_columns, data=data_view)
+
+    q.page['table'] = cards.table_paginated(
+        name=q.client.name,
+        data=q.client.data,
+        data_view=data_view,
+        columns=columns,
+        group_by=q.client.table_group_by,
+        loading=q.client.loading
+    )
+
+    await q.page.save()
+
+
+@on('export')
+async def export_data(q: Q):
+    """
+    Export view of data in the chosen format.
+    """
+
+    # Only the formats offered are exported, as the format is part of the exported file name
+    if q.args.export_format not in constants.EXPORT_FORMATS:
+        logging.warning(f'Not exporting data in unknown format "{q.args.export_format}"')
+        return
+
+    await export_view(q, export_format=q.args.export_format)
+
+
+async def export_view(q: Q, export_format: str):
+    """
+    Export sorted, searched, filtered and grouped view of data on the server and redirect to the exported file.
+    The view is written in chunks of rows in the background, so all rows can be exported with bounded memory.
+    """
+
+    logging.info(f'Exporting data as {export_format}')
+
+    path_dir = tempfile.mkdtemp()
+    path_export = os.path.join(path_dir, f'{Path(q.client.name).stem}.{export_format}')
+
+    try:
+        await q.run(utils.export_data, data=q.client.data_view, path=path_export)
+        url_export, = await q.site.upload(files=[path_export])
+    finally:
+        shutil.rmtree(path_dir, ignore_errors=True)
+
+    # Only the latest export of the client is kept on the Wave server
+    await unload_export(q)
+    q.client.export_url = url_export
+
+    q.page['meta'].redirect = url_export
+
+    await q.page.save()
+
+
+async def unload_export(q: Q):
+    """
+    Remove the latest exported file of the client from the Wave server, if any.
+    """
+
+    if q.client.export_url is not None:
+        await q.site.unload(q.client.export_url)
+        q.client.export_url = None
+
+
 def clear_cards(q: Q, card_names: list):
     """
     Clear cards from the page.
@@ -163,6 +587,10 @@ async def reload_client(q: Q):
     # Clear all cards
     clear_cards(q, q.app.cards)
 
+    # Release scratch space and exported file of the client
+    q.app.scratch.release(q.client.scratch_id)
+    await unload_export(q)
+
     # Reload the client
     await initialize_client(q)
 
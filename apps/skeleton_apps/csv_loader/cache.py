@@ -0,0 +1,95 @@
+import logging
+import sys
+from collections import OrderedDict
+
+import datatable as dt
+
+
+class FrameCache:
+    """
+    Least recently used cache of data of uploaded files by their fingerprint, shared across clients and bounded by
+    memory.
+    """
+
+    def __init__(self, max_memory: int):
+        self.max_memory = max_memory
+        self.memory = 0
+        self.frames = OrderedDict()
+        self.samples = {}
+
+    def get(self, fingerprint: str) -> dt.Frame:
+        """
+        Get data of a file, None if not cached.
+        """
+
+        if fingerprint not in self.frames:
+            return None
+
+        self.frames.move_to_end(fingerprint)
+
+        return self.frames[fingerprint]['data']
+
+    def find(self, sample: str) -> str:
+        """
+        Find fingerprint of cached data of a file by the fingerprint of a sample of the file, None if not cached.
+        """
+
+        return self.samples.get(sample)
+
+    def put(self, fingerprint: str, data: dt.Frame, sample: str = None):
+        """
+        Cache data of a file, with the fingerprint of a sample of the file if known, evicting least recently used data
+        beyond the memory limit.
+        """
+
+        memory = sys.getsizeof(data)
+        if fingerprint in self.frames or memory > self.max_memory:
+            return
+
+        self.frames[fingerprint] = {'data': data, 'memory': memory, 'sample': sample}
+        self.memory += memory
+        if sample is not None:
+            self.samples[sample] = fingerprint
+
+        while self.memory > self.max_memory:
+            _, frame = self.frames.popitem(last=False)
+            self.memory -= frame['memory']
+            self.samples.pop(frame['sample'], None)
+
+        logging.info(f'Frame cache: {len(self.frames)} files, {self.memory} bytes')
+
+
+class SchemaCache:
+    """
+    Least recently used cache of schemas of csv files by their header, shared across clients.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.schemas = OrderedDict()
+
+    def get(self, header: bytes) -> dict:
+        """
+        Get schema of csv files with a header, None if not cached.
+        """
+
+        if header not in self.schemas:
+            return None
+
+        self.schemas.move_to_end(header)
+
+        return self.schemas[header]
+
+    def put(self, header: bytes, schema: dict):
+        """
+        Cache schema of csv files with a header, evicting least recently used schemas beyond the size limit.
+        """
+
+        if schema is None:
+            return
+
+        self.schemas[header] = schema
+        self.schemas.move_to_end(header)
+
+        while len(self.schemas) > self.max_size:
+            self.schemas.popitem(last=False)
@@ -4,6 +4,9 @@ import traceback
 import datatable as dt
 from h2o_wave import Q, expando_to_dict, ui
 
+import constants
+import utils
+
 # App name
 app_name = 'CSV Loader'
 
@@ -105,6 +108,107 @@ def table(name: str, data: dt.Frame) -> ui.FormCard:
     return card
 
 
+def table_paginated(name: str, data: dt.Frame, data_view: dt.Frame, columns: list[ui.TableColumn], group_by: str,
+                    loading: bool = False) -> ui.FormCard:
+    """
+    Card for displaying csv data in a paginated table, with only the current page of rows.
+    Sorting, searching, filtering, grouping and exporting of rows are handled on the server.
+    Columns are created in the background beforehand, as filters of string columns scan the whole view.
+    """
+
+    card = ui.form_card(
+        box=ui.box(zone='main', order=2, size=10),
+        items=[
+            ui.text_l(content=table_caption(name=name, n_rows=data.nrows, loading=loading)),
+            ui.inline(
+                items=[
+                    ui.dropdown(
+                        name='group_by',
+                        label='Group By',
+                        choices=[ui.choice(name=constants.NO_GROUP_BY, label='None')] + [
+                            ui.choice(name=str(col), label=str(col)) for col in data.names
+                        ],
+                        value=group_by,
+                        trigger=True,
+                        width='200px'
+                    ),
+                    ui.dropdown(
+                        name='export_format',
+                        label='Export As',
+                        choices=[ui.choice(name=export_format, label=export_format) for export_format in
+                                 constants.EXPORT_FORMATS],
+                        value=constants.EXPORT_FORMATS[0],
+                        width='100px'
+                    ),
+                    ui.button(name='export', label='Export', icon='Download', disabled=loading)
+                ],
+                justify='start',
+                inset=False
+            ),
+            ui.table(
+                name='data',
+                columns=columns,
+                rows=table_rows(data=data_view, offset=0),
+                pagination=table_pagination(data=data_view),
+                downloadable=True,
+                resettable=True,
+                events=['page_change', 'sort', 'search', 'filter', 'reset', 'download'],
+                height='calc(100vh - 290px)'
+            )
+        ]
+    )
+
+    return card
+
+
+def table_columns(data: dt.Frame) -> list[ui.TableColumn]:
+    """
+    Columns of paginated table, with filters of string columns with few unique values.
+    """
+
+    columns = []
+    for col in data.names:
+        filters = utils.create_column_filters(data=data, col=col)
+        columns.append(ui.table_column(
+            name=str(col),
+            label=str(col),
+            sortable=True,
+            searchable=True,
+            filterable=filters is not None,
+            link=False,
+            filters=filters
+        ))
+
+    return columns
+
+
+def table_caption(name: str, n_rows: int, loading: bool = False) -> str:
+    """
+    Caption of paginated table, with the number of rows loaded so far.
+    """
+
+    return f'<center>{name} ({n_rows} rows{", loading..." if loading else ""})'
+
+
+def table_pagination(data: dt.Frame) -> ui.TablePagination:
+    """
+    Pagination of csv data.
+    """
+
+    return ui.table_pagination(total_rows=data.nrows, rows_per_page=constants.ROWS_PER_PAGE)
+
+
+def table_rows(data: dt.Frame, offset: int = 0) -> list[ui.TableRow]:
+    """
+    Rows of a single page of csv data.
+    """
+
+    return [ui.table_row(
+        name=str(offset + i),
+        cells=[str(value) for value in row]
+    ) for i, row in enumerate(data[offset:offset + constants.ROWS_PER_PAGE, :].to_tuples())]
+
+
 def crash_report(q: Q) -> ui.FormCard:
     """
     Card for capturing the stack trace and current application state, for error reporting.
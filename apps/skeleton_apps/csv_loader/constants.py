@@ -0,0 +1,51 @@
+# Minimum size in bytes of a csv file to stream it in chunks into a paginated table
+STREAMING_MIN_SIZE = 10 * 1024 ** 2
+
+# Size in bytes of the first chunk of a streamed csv file, displayed as soon as it is parsed
+FIRST_CHUNK_SIZE = 1024 ** 2
+
+# Maximum size in bytes of later chunks, each being twice the size of the previous one
+MAX_CHUNK_SIZE = 256 * 1024 ** 2
+
+# Number of rows displayed in a single page of the paginated table
+ROWS_PER_PAGE = 100
+
+# Maximum number of unique values in a string column to display it as filters
+MAX_FILTER_VALUES = 50
+
+# Choice of group by dropdown for not grouping rows
+NO_GROUP_BY = '-'
+
+# Number of rows written at a time when exporting data
+EXPORT_CHUNK_ROWS = 100_000
+
+# Formats of exported data
+EXPORT_FORMATS = ['csv', 'parquet', 'jay']
+
+# Size in bytes of chunks of a file read at a time to fingerprint it
+CHUNK_SIZE = 1024 ** 2
+
+# Directory of scratch space for files downloaded by clients
+SCRATCH_DIR = 'scratch'
+
+# Maximum total size in bytes of files in scratch space, beyond which files not used by any client are evicted
+SCRATCH_QUOTA = 10 * 1024 ** 3
+
+# Time in seconds after which scratch space of an idle client is released
+SCRATCH_CLIENT_TIMEOUT = 60 * 60
+
+# Directory of uploaded files in scratch space, stored once by the fingerprint of their contents
+UPLOADS_DIR = 'scratch/uploads'
+
+# Maximum memory in bytes of data of uploaded files kept loaded for repeated uploads
+FRAMES_MEMORY = 2 * 1024 ** 3
+
+# Detect separator, header and types of columns of csv files not read before, else read all columns as strings
+SNIFF_SCHEMA = True
+
+# Separators of csv files recognized in headers, and the one used when not detecting it
+SEPARATORS = [',', '\t', ';', '|']
+DEFAULT_SEPARATOR = ','
+
+# Maximum number of schemas of csv files remembered by their header
+SCHEMA_CACHE_SIZE = 1024
@@ -0,0 +1,259 @@
+import hashlib
+import logging
+import os
+from functools import reduce
+from operator import and_, or_
+from pathlib import Path
+from typing import Iterator
+
+import datatable as dt
+
+import constants
+
+# Types of columns that fread can be told to read a column as
+FREAD_STYPES = [
+    dt.stype.bool8, dt.stype.int32, dt.stype.int64, dt.stype.float32, dt.stype.float64, dt.stype.str32, dt.stype.str64
+]
+
+
+def fingerprint_file(path: str) -> str:
+    """
+    Create fingerprint of a file from its contents.
+    """
+
+    fingerprint = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(constants.CHUNK_SIZE), b''):
+            fingerprint.update(chunk)
+
+    return fingerprint.hexdigest()
+
+
+def sample_file(path: str) -> str:
+    """
+    Create fingerprint of a sample of a file, its size with its first and last chunks, to cheaply recognize files that
+    are likely uploaded before.
+    """
+
+    size = os.path.getsize(path)
+
+    sample = hashlib.sha256(str(size).encode())
+    with open(path, 'rb') as file:
+        sample.update(file.read(constants.CHUNK_SIZE))
+        file.seek(max(size - constants.CHUNK_SIZE, 0))
+        sample.update(file.read(constants.CHUNK_SIZE))
+
+    return sample.hexdigest()
+
+
+def store_upload(path: str, fingerprint: str = None) -> tuple[str, str]:
+    """
+    Store uploaded file by the fingerprint of its contents, keeping a single copy of repeatedly uploaded files.
+    The fingerprint is computed if not known. Returns the path of the stored file and its fingerprint.
+    """
+
+    if fingerprint is None:
+        fingerprint = fingerprint_file(path=path)
+
+    path_stored = Path(constants.UPLOADS_DIR) / f'{fingerprint}{Path(path).suffix}'
+    if path_stored.exists():
+        os.remove(path)
+    else:
+        path_stored.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(path, path_stored)
+
+    return str(path_stored), fingerprint
+
+
+def read_header(path: str) -> bytes:
+    """
+    Read header of csv file, its first line.
+    """
+
+    with open(path, 'rb') as file:
+        return file.readline().rstrip(b'\r\n')
+
+
+def create_schema(header: bytes, data: dt.Frame) -> dict:
+    """
+    Create schema of csv data from its header, with its separator and types of columns (None if the header is not
+    recognized). Types that fread cannot be told to read are detected on every read.
+    """
+
+    text = header.decode(errors='replace')
+
+    for sep in constants.SEPARATORS:
+        if text.split(sep) == list(data.names):
+            return {
+                'sep': sep,
+                'columns': [(name, stype if stype in FREAD_STYPES else ...) for name, stype in zip(data.names, data.stypes)]
+            }
+
+    return None
+
+
+def create_schema_columns(schema: dict) -> list[tuple]:
+    """
+    Create columns of fread from a schema, reading columns of unknown type as strings if detection is disabled.
+    """
+
+    if constants.SNIFF_SCHEMA:
+        return schema['columns']
+
+    return [(name, dt.stype.str32 if stype is ... else stype) for name, stype in schema['columns']]
+
+
+def read_csv(schema: dict = None, **kwargs) -> dt.Frame:
+    """
+    Read csv data with header, with the separator and types of columns of a schema of data with the same header.
+    Without a schema, or if the data does not fit the schema, they are detected by fread unless detection is disabled,
+    in which case all columns are read as strings.
+    """
+
+    if schema is not None:
+        try:
+            return dt.fread(sep=schema['sep'], header=True, columns=create_schema_columns(schema=schema), **kwargs)
+        except IOError:
+            if not constants.SNIFF_SCHEMA:
+                raise
+            logging.info('Data does not fit the schema of its header, detecting schema')
+
+    if not constants.SNIFF_SCHEMA:
+        return dt.fread(sep=constants.DEFAULT_SEPARATOR, header=True, columns={...: dt.stype.str32}, **kwargs)
+
+    return dt.fread(**kwargs)
+
+
+def read_csv_chunks(path: str, schema: dict = None, fingerprint=None) -> Iterator[dt.Frame]:
+    """
+    Read csv file in chunks of rows, each chunk twice the size in bytes of the previous one.
+    The schema of data with the same header is used if known, else it is detected in the first chunk.
+    If given, the fingerprint (a hashlib object) is updated with the contents of the file as it is read.
+    """
+
+    with open(path, 'rb') as file:
+        chunk_size = constants.FIRST_CHUNK_SIZE
+        names = None
+
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+
+            # Complete the last line of the chunk
+            chunk += file.readline()
+
+            if fingerprint is not None:
+                fingerprint.update(chunk)
+
+            # Header, separator and types are detected in the first chunk, unless known from the schema
+            if names is None:
+                data = read_csv(schema=schema, text=chunk)
+                names = data.names
+
+                if schema is not None:
+                    sep, columns = schema['sep'], create_schema_columns(schema=schema)
+                elif constants.SNIFF_SCHEMA:
+                    # Separator is reused for later chunks, but types are detected in each chunk
+                    schema = create_schema(header=chunk.split(b'\n', 1)[0].rstrip(b'\r'), data=data)
+                    sep, columns = schema['sep'] if schema is not None else None, names
+                else:
+                    sep, columns = constants.DEFAULT_SEPARATOR, [(name, dt.stype.str32) for name in names]
+            else:
+                try:
+                    data = dt.fread(text=chunk, sep=sep, header=False, columns=columns)
+                except IOError:
+                    if not constants.SNIFF_SCHEMA:
+                        raise
+                    data = dt.fread(text=chunk, sep=sep, header=False, columns=names)
+
+            yield data
+
+            chunk_size = min(chunk_size * 2, constants.MAX_CHUNK_SIZE)
+
+
+def create_column_filters(data: dt.Frame, col: str) -> list[str]:
+    """
+    Create filter values of a column, only for string columns with few unique values (None otherwise).
+    """
+
+    if data[col].ltypes[0] != dt.ltype.str or data[:, dt.nunique(dt.f[col])][0, 0] > constants.MAX_FILTER_VALUES:
+        return None
+
+    return [str(value) for value in dt.unique(data[col]).to_list()[0] if value is not None]
+
+
+def create_search_pattern(search: str) -> str:
+    """
+    Create a case-insensitive regex pattern matching values containing the search term.
+    """
+
+    pattern = ''
+    for char in search:
+        if char.lower() != char.upper():
+            pattern += f'[{char.lower()}{char.upper()}]'
+        elif char in r'\^$.|?*+()[]{}':
+            pattern += f'\\{char}'
+        else:
+            pattern += char
+
+    return f'.*{pattern}.*'
+
+
+def create_view(data: dt.Frame, sort: dict = None, search: str = None, filters: dict = None,
+                group_by: str = None) -> dt.Frame:
+    """
+    Apply search, filters, grouping and sort of the table on data as datatable expressions.
+    """
+
+    conditions = []
+
+    # Keep rows matching any of the selected values of each filtered column
+    if filters:
+        for col, values in filters.items():
+            if values:
+                conditions.append(reduce(or_, [dt.f[col] == value for value in values]))
+
+    # Keep rows with any column containing the search term
+    if search:
+        pattern = create_search_pattern(search=search)
+        conditions.append(dt.rowany(*[dt.re.match(dt.as_type(dt.f[col], dt.str32), pattern) for col in data.names]))
+
+    if conditions:
+        data = data[reduce(and_, conditions), :]
+
+    # Count rows of each group
+    if group_by:
+        data = data[:, dt.count(), dt.by(group_by)]
+
+    # Sort rows by columns, with True as descending order
+    sort = {col: reverse for col, reverse in (sort or {}).items() if col in data.names}
+    if sort:
+        data = data[:, :, dt.sort(*sort.keys(), reverse=list(sort.values()))]
+
+    return data
+
+
+def export_data(data: dt.Frame, path: str):
+    """
+    Export data to a csv, parquet or jay file based on its extension, writing chunks of rows at a time.
+    """
+
+    suffix = Path(path).suffix
+
+    if suffix == '.jay':
+        # Jay files are written at once, directly from the frame's memory
+        data.to_jay(path)
+    elif suffix == '.parquet':
+        import pyarrow.parquet as pq
+
+        writer = None
+        for offset in range(0, max(data.nrows, 1), constants.EXPORT_CHUNK_ROWS):
+            chunk = data[offset:offset + constants.EXPORT_CHUNK_ROWS, :].to_arrow()
+            if writer is None:
+                writer = pq.ParquetWriter(path, chunk.schema)
+            writer.write_table(chunk)
+        writer.close()
+    else:
+        for offset in range(0, max(data.nrows, 1), constants.EXPORT_CHUNK_ROWS):
+            data[offset:offset + constants.EXPORT_CHUNK_ROWS, :].to_csv(path, append=offset > 0, header=offset == 0)
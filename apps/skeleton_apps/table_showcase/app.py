@@ -1,8 +1,12 @@
+import asyncio
 import logging
 
-from h2o_wave import Q, main, app, copy_expando, handle_on, on
+from h2o_wave import Q, main, app, copy_expando, handle_on, on, ui
 
 import cards
+import constants
+import media
+import sources
 
 # Set up logging
 logging.basicConfig(format='%(levelname)s:\t[%(asctime)s]\t%(message)s', level=logging.INFO)
@@ -52,6 +56,23 @@ async def initialize_app(q: Q):
     # Set initial argument values
     q.app.cards = ['table', 'error']
 
+    # Source of rows of the table, shared across clients
+    q.app.source = await q.run(sources.create_source, kind=constants.ROW_SOURCE)
+    q.app.pages = sources.PageCache(
+        source=q.app.source,
+        rows_per_page=constants.ROWS_PER_PAGE,
+        max_pages=constants.MAX_CACHED_PAGES,
+        ttl=constants.PAGE_CACHE_TTL
+    )
+
+    # Thumbnails of pictures displayed in the table, shared across clients
+    q.app.thumbnails = media.ThumbnailCache(
+        directory=constants.THUMBNAILS_DIR,
+        max_thumbnails=constants.MAX_THUMBNAILS,
+        max_downloads=constants.MAX_MEDIA_DOWNLOADS,
+        retry_interval=constants.MEDIA_RETRY_INTERVAL
+    )
+
     q.app.initialized = True
 
 
@@ -71,7 +92,7 @@ async def initialize_client(q: Q):
     q.page['footer'] = cards.footer
 
     # Add cards for the main page
-    q.page['table'] = cards.table()
+    await update_table_card(q)
 
     q.client.initialized = True
 
@@ -116,10 +137,11 @@ async def view_transaction(q: Q):
     q.page['table'].items[1].buttons.items[1].button.name = 'multiselect'
     q.page['table'].items[1].buttons.items[1].button.label = 'Multiselect'
 
-    # Display row information in a dialog
-    rows = [int(i) for i in q.args.transactions] if q.args.transactions else [int(q.args.view_transaction)]
+    # Display row information in a dialog, looking up all selected rows at once
+    ids = [int(i) for i in q.args.transactions] if q.args.transactions else [int(q.args.view_transaction)]
+    records = await q.run(q.app.source.get, ids)
 
-    q.page['meta'].dialog = cards.dialog_transaction(rows=rows)
+    q.page['meta'].dialog = cards.dialog_transaction(records=records)
 
     await q.page.save()
 
@@ -133,7 +155,9 @@ async def view_image(q: Q):
     logging.info('Viewing image')
 
     # Display image in a dialog
-    q.page['meta'].dialog = cards.dialog_image(row=int(q.args.view_image))
+    record, = await q.run(q.app.source.get, [int(q.args.view_image)])
+
+    q.page['meta'].dialog = cards.dialog_image(record=record)
 
     await q.page.save()
 
@@ -147,8 +171,7 @@ async def paginate(q: Q):
     logging.info('Enabling pagination')
 
     # Enable pagination in the table
-    q.page['table'] = cards.table(pagination=True)
-    q.page['table'].items[0].table.rows = cards.update_table_rows(page_offset=0)
+    await update_table_card(q, pagination=True)
 
     await q.page.save()
 
@@ -162,11 +185,33 @@ async def paginate(q: Q):
     logging.info('Disabling pagination')
 
     # Disable pagination in the table
-    q.page['table'] = cards.table()
+    await update_table_card(q)
 
     await q.page.save()
 
 
+async def update_table_card(q: Q, pagination: bool = False):
+    """
+    Update table card, with only the first page of rows fetched from the source if paginated.
+    """
+
+    if pagination and constants.PAGINATION == 'keyset':
+        records = await fetch_page_keyset(q, page_offset=0)
+    elif pagination:
+        records = await q.run(q.app.pages.get, 0)
+        prefetch_pages(q, page_offset=0)
+    else:
+        records = await q.run(q.app.source.fetch, 0, constants.MAX_ROWS)
+
+    total_rows = await q.run(q.app.source.count)
+
+    q.page['table'] = cards.table(
+        rows=create_table_rows(q, records=records),
+        total_rows=total_rows,
+        pagination=pagination
+    )
+
+
 async def update_table(q: Q):
     """
     Update table.
@@ -174,12 +219,103 @@ async def update_table(q: Q):
 
     logging.info('Updating table')
 
-    # Update table with page change
     page_offset = q.events.transactions.page_change.get('offset', 0)
 
-    q.page['table'].items[0].table.rows = cards.update_table_rows(page_offset=page_offset)
+    if constants.PAGINATION == 'keyset':
+        # Update table with page change, seeking the rows of the page from the rows displayed
+        records = await fetch_page_keyset(q, page_offset=page_offset)
+        q.page['table'].items[0].table.rows = create_table_rows(q, records=records)
 
-    await q.page.save()
+        await q.page.save()
+    else:
+        # Update table with page change, fetching only the rows of the page from the source if not already cached
+        records = await q.run(q.app.pages.get, page_offset)
+        q.page['table'].items[0].table.rows = create_table_rows(q, records=records)
+
+        await q.page.save()
+
+        prefetch_pages(q, page_offset=page_offset)
+
+
+async def fetch_page_keyset(q: Q, page_offset: int) -> list[dict]:
+    """
+    Fetch page of rows by seeking rows after the last or before the first row displayed, when moving to the next or
+    previous page. Rows are fetched by offset only when jumping to other pages.
+    """
+
+    rows_per_page = constants.ROWS_PER_PAGE
+
+    if page_offset == 0:
+        records = await q.run(q.app.source.fetch_after, None, rows_per_page)
+    elif page_offset == q.client.page_offset + rows_per_page and q.client.page_last_key is not None:
+        records = await q.run(q.app.source.fetch_after, q.client.page_last_key, rows_per_page)
+    elif page_offset == q.client.page_offset - rows_per_page and q.client.page_first_key is not None:
+        records = await q.run(q.app.source.fetch_before, q.client.page_first_key, rows_per_page)
+    else:
+        records = await q.run(q.app.source.fetch, page_offset, rows_per_page)
+
+    # Save sort keys of the first and last rows displayed, for seeking the adjacent pages
+    q.client.page_offset = page_offset
+    q.client.page_first_key = sources.record_key(records[0]) if records else None
+    q.client.page_last_key = sources.record_key(records[-1]) if records else None
+
+    return records
+
+
+def create_table_rows(q: Q, records: list[dict]) -> list[ui.TableRow]:
+    """
+    Create rows of table, with thumbnails of their pictures already generated.
+    Thumbnails not yet generated are generated in the background and displayed once ready.
+    """
+
+    urls = [record['picture'] for record in records]
+
+    # Rows displayed, so that thumbnails generated after the table moved on to other rows are not displayed
+    q.client.table_records = records
+
+    if q.app.thumbnails.missing(urls=urls):
+        asyncio.ensure_future(update_table_thumbnails(q, records=records))
+
+    return cards.table_rows(records=records, thumbnails=q.app.thumbnails.get(urls=urls))
+
+
+async def update_table_thumbnails(q: Q, records: list[dict]):
+    """
+    Update rows of table with thumbnails of their pictures once generated, if the rows are still displayed.
+    """
+
+    urls = [record['picture'] for record in records]
+
+    try:
+        missing = await q.app.thumbnails.load(q, urls=urls)
+
+        if missing and q.client.table_records is records:
+            q.page['table'].items[0].table.rows = cards.table_rows(
+                records=records,
+                thumbnails=q.app.thumbnails.get(urls=urls)
+            )
+
+            await q.page.save()
+    except Exception as error:
+        logging.error(f'Unable to update thumbnails: {error}')
+
+
+def prefetch_pages(q: Q, page_offset: int):
+    """
+    Prefetch pages adjacent to the displayed page in the background, without waiting for them.
+    """
+
+    future = asyncio.ensure_future(q.run(q.app.pages.prefetch, page_offset, constants.PREFETCH_DEPTH))
+    future.add_done_callback(log_prefetch_error)
+
+
+def log_prefetch_error(future: asyncio.Future):
+    """
+    Log error of prefetching pages, which is not awaited.
+    """
+
+    if not future.cancelled() and future.exception() is not None:
+        logging.error(f'Unable to prefetch pages: {future.exception()}')
 
 
 @on('multiselect')
@@ -231,6 +367,9 @@ async def show_error(q: Q, error: str):
 
     logging.error(error)
 
+    # Stop displaying thumbnails generated for the table
+    q.client.table_records = None
+
     # Clear all cards
     clear_cards(q, q.app.cards)
 
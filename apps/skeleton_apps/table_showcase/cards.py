@@ -1,8 +1,11 @@
 import sys
 import traceback
+from typing import Optional
 
 from h2o_wave import Q, expando_to_dict, ui
 
+import constants
+
 # App name
 app_name = 'Table Showcase'
 
@@ -137,48 +140,15 @@ table_columns = [
     )
 ]
 
-table_rows = [
-    ui.table_row(
-        name='0',
-        cells=['0', 'Adam', 'Coffee',
-               '<b>Product</b>: <i>Coffee</i>\n<b>Category</b>: <i>Beverages</i>', 'CoffeeScript',
-               '<center><img src="https://images.unsplash.com/photo-1587049016823-69ef9d68bd44" width="70%">',
-               '<center><audio controls><source src="https://media.merriam-webster.com/audio/prons/en/us/mp3/c/coffee01.mp3" type="audio/wav">',
-               '1', '0.09', 'Beverage,Sale']
-    ),
-    ui.table_row(
-        name='1',
-        cells=['1', 'Sarah', 'Balloons',
-               '<b>Product</b>: <i>Balloons</i>\n<b>Category</b>: <i>Home</i>', 'Balloons',
-               '<center><img src="https://images.unsplash.com/photo-1574276254982-d209f79d673a" width="70%">',
-               '<center><audio controls><source src="https://media.merriam-webster.com/audio/prons/en/us/mp3/b/balloo01.mp3" type="audio/wav">',
-               '10', '0.66', 'Home,Sale']
-    ),
-    ui.table_row(
-        name='2',
-        cells=['2', 'Adam', 'Television',
-               '<b>Product</b>: <i>Television</i>\n<b>Category</b>: <i>Retail</i>', 'TVMonitor',
-               '<center><img src="https://images.unsplash.com/photo-1552975084-6e027cd345c2" width="70%">',
-               '<center><audio controls><source src="https://media.merriam-webster.com/audio/prons/en/us/mp3/t/televi03.mp3" type="audio/wav">',
-               '1', '0', 'Retail']
-    ),
-    ui.table_row(
-        name='3',
-        cells=['3', 'Jen', 'Balloons',
-               f'<b>Product</b>: <i>Balloons</i>\n<b>Category</b>: <i>Home</i>', 'Balloons',
-               '<center><img src="https://images.unsplash.com/photo-1574276254982-d209f79d673a" width="70%">',
-               '<center><audio controls><source src="https://media.merriam-webster.com/audio/prons/en/us/mp3/b/balloo01.mp3" type="audio/wav">',
-               '3', '0.15', 'Home,Sale']
-    )
-]
-
-
-def table(pagination: bool = False) -> ui.FormCard:
+def table(rows: list[ui.TableRow], total_rows: int, pagination: bool = False) -> ui.FormCard:
     """
     Card for table.
     """
 
-    pagination = ui.table_pagination(total_rows=4, rows_per_page=2) if pagination else None
+    if pagination:
+        pagination = ui.table_pagination(total_rows=total_rows, rows_per_page=constants.ROWS_PER_PAGE)
+    else:
+        pagination = None
 
     card = ui.form_card(
         box='main',
@@ -186,7 +156,7 @@ def table(pagination: bool = False) -> ui.FormCard:
             ui.table(
                 name='transactions',
                 columns=table_columns,
-                rows=table_rows,
+                rows=rows,
                 pagination=pagination,
                 groupable=True,
                 resettable=True,
@@ -211,50 +181,50 @@ def table(pagination: bool = False) -> ui.FormCard:
     return card
 
 
-def update_table_rows(page_offset: int = 0) -> list[ui.TableRow]:
+def table_rows(records: list[dict], thumbnails: dict[str, Optional[str]]) -> list[ui.TableRow]:
     """
-    Update rows of table.
+    Rows of table from records of transactions, with thumbnails of pictures and audio loaded only when played.
+    Pictures whose thumbnails are not yet generated are left empty.
     """
 
-    return table_rows[page_offset: page_offset + 2]
+    return [
+        ui.table_row(
+            name=str(record['id']),
+            cells=[
+                str(record['id']),
+                record['user'],
+                record['product'],
+                f'<b>Product</b>: <i>{record["product"]}</i>\n<b>Category</b>: <i>{record["category"]}</i>',
+                record['icon'],
+                f'<center><img src="{thumbnails[record["picture"]]}" width="70%">' if thumbnails[record['picture']] else '',
+                f'<center><audio controls preload="none"><source src="{record["audio"]}" type="audio/wav">',
+                str(record['quantity']),
+                str(record['discount']),
+                record['tags']
+            ]
+        ) for record in records
+    ]
 
 
-def dialog_transaction(rows: list[int]) -> ui.Dialog:
+def dialog_transaction(records: list[dict]) -> ui.Dialog:
     """
     Dialog for viewing transaction.
     """
 
-    if len(rows) == 1:
-        if rows[0] == 0:
-            user, product, category, quantity = 'Adam', 'Coffee', 'Beverage', 1
-        elif rows[0] == 1:
-            user, product, category, quantity = 'Sarah', 'Balloons', 'Home', 10
-        elif rows[0] == 2:
-            user, product, category, quantity = 'Adam', 'Television', 'Retail', 1
-        else:
-            user, product, category, quantity = 'Jen', 'Balloons', 'Home', 3
-
+    if len(records) == 1:
         items = [
-            ui.text(f'**User**: {user}'),
-            ui.text(f'**Product**: {product}'),
-            ui.text(f'**Category**: {category}'),
-            ui.text(f'**Quantity**: {quantity}'),
+            ui.text(f'**User**: {records[0]["user"]}'),
+            ui.text(f'**Product**: {records[0]["product"]}'),
+            ui.text(f'**Category**: {records[0]["category"]}'),
+            ui.text(f'**Quantity**: {records[0]["quantity"]}'),
         ]
     else:
-        items = []
-        for row in rows:
-            if row == 0:
-                user, product, category, quantity = 'Adam', 'Coffee', 'Beverage', 1
-            elif row == 1:
-                user, product, category, quantity = 'Sarah', 'Balloons', 'Home', 10
-            elif row == 2:
-                user, product, category, quantity = 'Adam', 'Television', 'Retail', 1
-            else:
-                user, product, category, quantity = 'Jen', 'Balloons', 'Home', 3
-
-            items.append(
-                ui.text(f'**User**: {user}\t**Product**:{product}\t**Category**:{category}\t**Quantity**:{quantity}')
-            )
+        items = [
+            ui.text(
+                f'**User**: {record["user"]}\t**Product**:{record["product"]}\t**Category**:{record["category"]}\t'
+                f'**Quantity**:{record["quantity"]}'
+            ) for record in records
+        ]
 
     dialog = ui.dialog(
         name='dialog_transaction',
@@ -267,22 +237,18 @@ def dialog_transaction(rows: list[int]) -> ui.Dialog:
     return dialog
 
 
-def dialog_image(row: int) -> ui.Dialog:
+def dialog_image(record: dict) -> ui.Dialog:
     """
-    Dialog for viewing image.
+    Dialog for viewing image in full, with its audio.
     """
 
-    if row == 0:
-        image_path = 'https://images.unsplash.com/photo-1587049016823-69ef9d68bd44'
-    elif row == 2:
-        image_path = 'https://images.unsplash.com/photo-1552975084-6e027cd345c2'
-    else:
-        image_path = 'https://images.unsplash.com/photo-1574276254982-d209f79d673a'
-
     dialog = ui.dialog(
         name='dialog_image',
         title='Image',
-        items=[ui.image(title='Image', path=image_path, width='100%')],
+        items=[
+            ui.image(title='Image', path=record['picture'], width='100%'),
+            ui.text(f'<center><audio controls><source src="{record["audio"]}" type="audio/wav">')
+        ],
         closable=True,
         events=['dismissed']
     )
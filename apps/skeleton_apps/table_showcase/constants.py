@@ -0,0 +1,105 @@
+# Sample transactions displayed in the table
+TRANSACTIONS = [
+    {
+        'id': 0,
+        'user': 'Adam',
+        'product': 'Coffee',
+        'category': 'Beverage',
+        'icon': 'CoffeeScript',
+        'picture': 'https://images.unsplash.com/photo-1587049016823-69ef9d68bd44',
+        'audio': 'https://media.merriam-webster.com/audio/prons/en/us/mp3/c/coffee01.mp3',
+        'quantity': 1,
+        'discount': 0.09,
+        'tags': 'Beverage,Sale'
+    },
+    {
+        'id': 1,
+        'user': 'Sarah',
+        'product': 'Balloons',
+        'category': 'Home',
+        'icon': 'Balloons',
+        'picture': 'https://images.unsplash.com/photo-1574276254982-d209f79d673a',
+        'audio': 'https://media.merriam-webster.com/audio/prons/en/us/mp3/b/balloo01.mp3',
+        'quantity': 10,
+        'discount': 0.66,
+        'tags': 'Home,Sale'
+    },
+    {
+        'id': 2,
+        'user': 'Adam',
+        'product': 'Television',
+        'category': 'Retail',
+        'icon': 'TVMonitor',
+        'picture': 'https://images.unsplash.com/photo-1552975084-6e027cd345c2',
+        'audio': 'https://media.merriam-webster.com/audio/prons/en/us/mp3/t/televi03.mp3',
+        'quantity': 1,
+        'discount': 0,
+        'tags': 'Retail'
+    },
+    {
+        'id': 3,
+        'user': 'Jen',
+        'product': 'Balloons',
+        'category': 'Home',
+        'icon': 'Balloons',
+        'picture': 'https://images.unsplash.com/photo-1574276254982-d209f79d673a',
+        'audio': 'https://media.merriam-webster.com/audio/prons/en/us/mp3/b/balloo01.mp3',
+        'quantity': 3,
+        'discount': 0.15,
+        'tags': 'Home,Sale'
+    }
+]
+
+# Source of rows of the table, one of 'list', 'datatable' or 'sqlite'
+ROW_SOURCE = 'list'
+
+# Number of rows of the datatable and sqlite sources, generated by repeating the sample transactions
+GENERATED_ROWS = 1_000_000
+
+# Path of the sqlite database of the sqlite source
+SQLITE_PATH = 'transactions.db'
+
+# Maximum number of rows looked up by id in a single query of the sqlite source
+SQLITE_BATCH_SIZE = 500
+
+# Column by which rows are sorted, with ties ordered by id
+SORT_COLUMN = 'id'
+
+# Pagination of the table, by 'offset' of pages or by 'keyset' seeking rows after the sort key of the last row displayed
+PAGINATION = 'offset'
+
+# Number of rows displayed in a single page of the paginated table
+ROWS_PER_PAGE = 2
+
+# Number of pages before and after the displayed page prefetched from the source
+PREFETCH_DEPTH = 2
+
+# Maximum number of pages of rows cached
+MAX_CACHED_PAGES = 1000
+
+# Time in seconds after which cached pages of rows expire, so that rows appended to the source are displayed
+PAGE_CACHE_TTL = 60
+
+# Maximum number of rows displayed in the table without pagination
+MAX_ROWS = 1000
+
+# Directory of thumbnails of pictures, before they are uploaded
+THUMBNAILS_DIR = 'thumbnails'
+
+# Maximum width and height in pixels of thumbnails of pictures
+THUMBNAIL_SIZE = (96, 96)
+
+# JPEG quality of thumbnails of pictures
+THUMBNAIL_QUALITY = 80
+
+# Maximum number of thumbnails of pictures cached
+MAX_THUMBNAILS = 10_000
+
+# Timeout in seconds of downloading pictures for thumbnails
+MEDIA_TIMEOUT = 10
+
+# Maximum number of pictures downloaded at once for thumbnails
+MAX_MEDIA_DOWNLOADS = 8
+
+# Time in seconds after which thumbnails of pictures that could not be downloaded are retried
+MEDIA_RETRY_INTERVAL = 5 * 60
@@ -0,0 +1,113 @@
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import time
+import urllib.request
+from collections import OrderedDict
+from typing import Optional
+
+from h2o_wave import Q
+from PIL import Image
+
+import constants
+
+
+def create_thumbnail(url: str, path: str):
+    """
+    Download image and save a thumbnail of it.
+    """
+
+    with urllib.request.urlopen(url, timeout=constants.MEDIA_TIMEOUT) as response:
+        image = Image.open(io.BytesIO(response.read()))
+
+    image.thumbnail(constants.THUMBNAIL_SIZE)
+    image.convert('RGB').save(path, format='JPEG', quality=constants.THUMBNAIL_QUALITY)
+
+
+class ThumbnailCache:
+    """
+    Least recently used cache of thumbnails of images, generated on the server and uploaded to Wave once.
+    Images are only loaded in full when viewed, as the table displays their thumbnails.
+    Thumbnails are generated in the background with a limited number of downloads at once, so rows are displayed
+    without waiting for them. Images whose thumbnails cannot be generated are retried after a while.
+    """
+
+    def __init__(self, directory: str, max_thumbnails: int, max_downloads: int, retry_interval: float):
+        self.directory = directory
+        self.max_thumbnails = max_thumbnails
+        self.retry_interval = retry_interval
+        self.thumbnails = OrderedDict()
+        self.pending = {}
+        self.failures = {}
+        self.downloads = asyncio.Semaphore(max_downloads)
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    def get(self, urls: list[str]) -> dict[str, Optional[str]]:
+        """
+        Get paths of thumbnails of images on Wave that are already generated, without waiting for the others.
+        Images whose thumbnails cannot be generated are displayed in full, and those not yet generated are not displayed.
+        """
+
+        paths = {}
+        for url in set(urls):
+            if url in self.thumbnails:
+                self.thumbnails.move_to_end(url)
+                paths[url] = self.thumbnails[url]
+            elif url in self.failures:
+                paths[url] = url
+            else:
+                paths[url] = None
+
+        return paths
+
+    def missing(self, urls: list[str]) -> list[str]:
+        """
+        Images whose thumbnails are neither generated nor recently failed.
+        """
+
+        now = time.monotonic()
+        for url, failed in list(self.failures.items()):
+            if now - failed > self.retry_interval:
+                del self.failures[url]
+
+        return [url for url in set(urls) if url not in self.thumbnails and url not in self.failures]
+
+    async def load(self, q: Q, urls: list[str]) -> bool:
+        """
+        Generate thumbnails of images not cached, waiting for them. Returns whether any thumbnail was missing.
+        """
+
+        # Thumbnails being generated are shared, so each image is downloaded once
+        missing = self.missing(urls=urls)
+        for url in missing:
+            if url not in self.pending:
+                self.pending[url] = asyncio.ensure_future(self.create(q, url=url))
+
+        await asyncio.gather(*[self.pending[url] for url in missing])
+
+        while len(self.thumbnails) > self.max_thumbnails:
+            self.thumbnails.popitem(last=False)
+
+        return len(missing) > 0
+
+    async def create(self, q: Q, url: str):
+        """
+        Generate thumbnail of an image in the background and upload it to Wave.
+        """
+
+        path = os.path.join(self.directory, f'{hashlib.sha1(url.encode()).hexdigest()}.jpg')
+
+        try:
+            async with self.downloads:
+                await q.run(create_thumbnail, url=url, path=path)
+                self.thumbnails[url], = await q.site.upload([path])
+        except Exception as error:
+            logging.warning(f'Unable to create thumbnail of {url}: {error}')
+            self.failures[url] = time.monotonic()
+        finally:
+            self.pending.pop(url, None)
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,398 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable
+
+import datatable as dt
+
+import constants
+
+# Fields of a transaction, in the order of columns of sources
+FIELDS = list(constants.TRANSACTIONS[0])
+
+# Columns of the sort key of rows, with the id making it unique so that the ordering is stable
+KEY = list(dict.fromkeys([constants.SORT_COLUMN, 'id']))
+
+
+class RowSource(ABC):
+    """
+    Source of rows of the table, fetching only the rows displayed.
+    Sources implement all methods, so that a source missing any fails when created rather than when paging.
+    """
+
+    @abstractmethod
+    def count(self) -> int:
+        """
+        Count rows of the source.
+        """
+
+    @abstractmethod
+    def fetch(self, offset: int, limit: int) -> list[dict]:
+        """
+        Fetch rows of the source in the order of the sort key, from offset to offset + limit.
+        """
+
+    @abstractmethod
+    def fetch_after(self, key: tuple, limit: int) -> list[dict]:
+        """
+        Fetch rows of the source with a sort key after key (from the first row if None), up to limit rows.
+        """
+
+    @abstractmethod
+    def fetch_before(self, key: tuple, limit: int) -> list[dict]:
+        """
+        Fetch rows of the source with a sort key before key, up to limit rows.
+        """
+
+    @abstractmethod
+    def get(self, ids: list[int]) -> list[dict]:
+        """
+        Get rows of the source by their ids, in the order of ids and skipping unknown ids.
+        """
+
+
+class ListSource(RowSource):
+    """
+    Source of rows in an in-memory list of records, sorted by the sort key.
+    """
+
+    def __init__(self, records: list[dict]):
+        self.records = sorted(records, key=record_key)
+        self.index = {record['id']: record for record in records}
+
+    def count(self) -> int:
+        return len(self.records)
+
+    def fetch(self, offset: int, limit: int) -> list[dict]:
+        return self.records[offset:offset + limit]
+
+    def fetch_after(self, key: tuple, limit: int) -> list[dict]:
+        start = 0 if key is None else bisect_key(lambda i: record_key(self.records[i]), len(self.records), key, True)
+
+        return self.records[start:start + limit]
+
+    def fetch_before(self, key: tuple, limit: int) -> list[dict]:
+        end = bisect_key(lambda i: record_key(self.records[i]), len(self.records), key, False)
+
+        return self.records[max(end - limit, 0):end]
+
+    def get(self, ids: list[int]) -> list[dict]:
+        return [self.index[i] for i in ids if i in self.index]
+
+
+class FrameSource(RowSource):
+    """
+    Source of rows in a datatable frame sorted by the sort key, converting only the rows fetched into records.
+    Rows are looked up by id through an index of their positions, created on the first lookup.
+    """
+
+    def __init__(self, data: dt.Frame):
+        self.data = data[:, :, dt.sort(*KEY)]
+        self.index = None
+
+    def count(self) -> int:
+        return self.data.nrows
+
+    def fetch(self, offset: int, limit: int) -> list[dict]:
+        return self.to_records(data=self.data[offset:offset + limit, :])
+
+    def fetch_after(self, key: tuple, limit: int) -> list[dict]:
+        start = 0 if key is None else bisect_key(self.row_key, self.data.nrows, key, True)
+
+        return self.to_records(data=self.data[start:start + limit, :])
+
+    def fetch_before(self, key: tuple, limit: int) -> list[dict]:
+        end = bisect_key(self.row_key, self.data.nrows, key, False)
+
+        return self.to_records(data=self.data[max(end - limit, 0):end, :])
+
+    def row_key(self, position: int) -> tuple:
+        """
+        Sort key of the row at a position.
+        """
+
+        return self.data[position, KEY].to_tuples()[0]
+
+    def get(self, ids: list[int]) -> list[dict]:
+        if self.index is None:
+            self.index = {i: position for position, i in enumerate(self.data['id'].to_list()[0])}
+
+        # All rows are selected at once by their positions
+        positions = [self.index[i] for i in ids if i in self.index]
+
+        return self.to_records(data=self.data[positions, :])
+
+    @staticmethod
+    def to_records(data: dt.Frame) -> list[dict]:
+        """
+        Convert rows of a frame into records.
+        """
+
+        return [dict(zip(data.names, row)) for row in data.to_tuples()]
+
+
+class SQLiteSource(RowSource):
+    """
+    Source of rows in a table of a sqlite database, querying only the rows fetched.
+    A connection is opened for each query, as rows are fetched in background threads.
+    """
+
+    def __init__(self, path: str, table: str):
+        self.path = path
+        self.table = table
+
+    def query(self, sql: str, parameters: tuple = ()) -> list[sqlite3.Row]:
+        """
+        Run a query on the database.
+        """
+
+        with sqlite3.connect(self.path) as connection:
+            connection.row_factory = sqlite3.Row
+            return connection.execute(sql, parameters).fetchall()
+
+    def count(self) -> int:
+        return self.query(f'SELECT COUNT(*) FROM {self.table}')[0][0]
+
+    def fetch(self, offset: int, limit: int) -> list[dict]:
+        rows = self.query(f'SELECT * FROM {self.table} ORDER BY {", ".join(KEY)} LIMIT ? OFFSET ?', (limit, offset))
+
+        return [dict(row) for row in rows]
+
+    def fetch_after(self, key: tuple, limit: int) -> list[dict]:
+        if key is None:
+            return self.fetch(0, limit)
+
+        return self.seek(key=key, limit=limit, after=True)
+
+    def fetch_before(self, key: tuple, limit: int) -> list[dict]:
+        return self.seek(key=key, limit=limit, after=False)[::-1]
+
+    def seek(self, key: tuple, limit: int, after: bool) -> list[dict]:
+        """
+        Seek rows after (or before, in reverse) a sort key in the index of the sort key, instead of scanning the rows
+        before them. Sqlite seeks an index only by the first column of a row value, so rows with the same sort column
+        are sought by id separately.
+        """
+
+        operator, order = ('>', 'ASC') if after else ('<', 'DESC')
+        ordering = ', '.join(f'{column} {order}' for column in KEY)
+
+        if len(KEY) == 1:
+            rows = self.query(
+                f'SELECT * FROM {self.table} WHERE {KEY[0]} {operator} ? ORDER BY {ordering} LIMIT ?',
+                (key[0], limit)
+            )
+        else:
+            rows = self.query(
+                f'SELECT * FROM {self.table} WHERE {KEY[0]} = ? AND id {operator} ? ORDER BY {ordering} LIMIT ?',
+                (key[0], key[1], limit)
+            )
+            rows += self.query(
+                f'SELECT * FROM {self.table} WHERE {KEY[0]} {operator} ? ORDER BY {ordering} LIMIT ?',
+                (key[0], limit - len(rows))
+            )
+
+        return [dict(row) for row in rows]
+
+    def get(self, ids: list[int]) -> list[dict]:
+        # Rows are looked up by the primary key, in batches within the limit of parameters of a query
+        records = {}
+        for start in range(0, len(ids), constants.SQLITE_BATCH_SIZE):
+            batch = ids[start:start + constants.SQLITE_BATCH_SIZE]
+            rows = self.query(f'SELECT * FROM {self.table} WHERE id IN ({", ".join("?" * len(batch))})', tuple(batch))
+            records.update((row['id'], dict(row)) for row in rows)
+
+        return [records[i] for i in ids if i in records]
+
+
+class PageCache:
+    """
+    Least recently used cache of pages of rows of a source, shared across clients.
+    Pages adjacent to the displayed page are prefetched in the background, so paging is served from the cache.
+    Pages are fetched in background threads, so the cache is guarded by a lock.
+    Pages expire after ttl seconds, so rows appended to or changed in the source are displayed, and can be invalidated
+    at once when the source is known to have changed.
+    """
+
+    def __init__(self, source: RowSource, rows_per_page: int, max_pages: int, ttl: float):
+        self.source = source
+        self.rows_per_page = rows_per_page
+        self.max_pages = max_pages
+        self.ttl = ttl
+        self.pages = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, offset: int) -> list[dict]:
+        """
+        Get page of rows from offset, fetching it from the source if not cached.
+        """
+
+        with self.lock:
+            if self.cached(offset=offset):
+                self.hits += 1
+                self.pages.move_to_end(offset)
+                return self.pages[offset][1]
+
+            self.misses += 1
+
+        return self.put(offset=offset)
+
+    def put(self, offset: int) -> list[dict]:
+        """
+        Fetch page of rows from offset from the source and cache it, evicting least recently used pages beyond the
+        limit.
+        """
+
+        records = self.source.fetch(offset, self.rows_per_page)
+
+        with self.lock:
+            self.pages[offset] = (time.monotonic(), records)
+            self.pages.move_to_end(offset)
+
+            while len(self.pages) > self.max_pages:
+                self.pages.popitem(last=False)
+
+        return records
+
+    def prefetch(self, offset: int, depth: int):
+        """
+        Prefetch pages before and after the page from offset, up to depth pages on each side, nearest pages first.
+        """
+
+        total_rows = self.source.count()
+
+        for distance in range(1, depth + 1):
+            for adjacent in [offset + distance * self.rows_per_page, offset - distance * self.rows_per_page]:
+                with self.lock:
+                    cached = self.cached(offset=adjacent)
+
+                if 0 <= adjacent < total_rows and not cached:
+                    self.put(offset=adjacent)
+
+        logging.info(f'Page cache: {len(self.pages)} pages, {self.hits} hits, {self.misses} misses')
+
+    def cached(self, offset: int) -> bool:
+        """
+        Check if page from offset is cached and not expired, dropping it if expired. Called with the lock held.
+        """
+
+        if offset not in self.pages:
+            return False
+
+        if time.monotonic() - self.pages[offset][0] > self.ttl:
+            del self.pages[offset]
+            return False
+
+        return True
+
+    def invalidate(self):
+        """
+        Drop all cached pages, when rows of the source have changed.
+        """
+
+        with self.lock:
+            self.pages.clear()
+
+        logging.info('Page cache invalidated')
+
+
+def record_key(record: dict) -> tuple:
+    """
+    Sort key of a record.
+    """
+
+    return tuple(record[column] for column in KEY)
+
+
+def bisect_key(row_key: Callable[[int], tuple], n_rows: int, key: tuple, after: bool) -> int:
+    """
+    Find position of the first row with a sort key after key (or not before key) in rows sorted by the sort key.
+    """
+
+    low, high = 0, n_rows
+    while low < high:
+        middle = (low + high) // 2
+        if row_key(middle) < tuple(key) or (after and row_key(middle) == tuple(key)):
+            low = middle + 1
+        else:
+            high = middle
+
+    return low
+
+
+def generate_transactions(n_rows: int) -> dict[str, list]:
+    """
+    Generate columns of transactions by repeating the sample transactions.
+    """
+
+    n_repeats, n_remaining = divmod(n_rows, len(constants.TRANSACTIONS))
+
+    columns = {}
+    for field in FIELDS:
+        values = [transaction[field] for transaction in constants.TRANSACTIONS]
+        columns[field] = values * n_repeats + values[:n_remaining]
+    columns['id'] = list(range(n_rows))
+
+    return columns
+
+
+def create_sqlite_database(path: str, n_rows: int):
+    """
+    Create sqlite database of generated transactions, if not already created.
+    """
+
+    if os.path.exists(path):
+        return
+
+    logging.info(f'Creating sqlite database {path}')
+
+    # Write to a temporary file first so that a partially written database is never read
+    path_tmp = f'{path}.tmp'
+    if os.path.exists(path_tmp):
+        os.remove(path_tmp)
+
+    columns = generate_transactions(n_rows=n_rows)
+    with sqlite3.connect(path_tmp) as connection:
+        connection.execute(f'CREATE TABLE transactions (id INTEGER PRIMARY KEY, {", ".join(FIELDS[1:])})')
+        connection.executemany(
+            f'INSERT INTO transactions VALUES ({", ".join("?" * len(FIELDS))})',
+            zip(*[columns[field] for field in FIELDS])
+        )
+    connection.close()
+
+    os.replace(path_tmp, path)
+
+
+def create_sqlite_index(path: str):
+    """
+    Create index of the sort key in sqlite database, if not already created, for seeking rows by their sort key.
+    """
+
+    with sqlite3.connect(path) as connection:
+        connection.execute(f'CREATE INDEX IF NOT EXISTS transactions_{"_".join(KEY)} ON transactions ({", ".join(KEY)})')
+    connection.close()
+
+
+def create_source(kind: str) -> RowSource:
+    """
+    Create source of rows of the table.
+    """
+
+    if kind == 'list':
+        return ListSource(records=constants.TRANSACTIONS)
+
+    if kind == 'datatable':
+        return FrameSource(data=dt.Frame(generate_transactions(n_rows=constants.GENERATED_ROWS)))
+
+    if kind == 'sqlite':
+        create_sqlite_database(path=constants.SQLITE_PATH, n_rows=constants.GENERATED_ROWS)
+        create_sqlite_index(path=constants.SQLITE_PATH)
+        return SQLiteSource(path=constants.SQLITE_PATH, table='transactions')
+
+    raise ValueError(f'Unknown row source "{kind}", use one of list, datatable or sqlite')
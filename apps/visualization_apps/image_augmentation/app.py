@@ -1,12 +1,22 @@
+import asyncio
+import itertools
 import logging
+import multiprocessing
 import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from uuid import uuid4
 
-import albumentations as A
 import cv2
 from h2o_wave import Q, main, app, copy_expando, handle_on, on
 
+import batch
 import cards
 import constants
+import scratch
+import utils
 
 # Set up logging
 logging.basicConfig(format='%(levelname)s:\t[%(asctime)s]\t%(message)s', level=logging.INFO)
@@ -22,6 +32,10 @@ async def serve(q: Q):
         if not q.app.initialized:
             await initialize_app(q)
 
+        # Mark the client as active, so that its scratch space is not released as idle
+        if q.client.initialized:
+            q.app.scratch.touch(q.client.scratch_id)
+
         # Initialize the client if not already
         if not q.client.initialized:
             await initialize_client(q)
@@ -61,12 +75,33 @@ async def initialize_app(q: Q):
     logging.info('Initializing app')
 
     # Set initial argument values
-    q.app.cards = ['upload', 'table', 'error']
+    q.app.cards = ['upload', 'table', 'dataset', 'error']
 
     # Upload default image
     q.app.default_image = cv2.imread('sample.jpeg')
+    q.app.default_preview = utils.create_preview(image=q.app.default_image)
     q.app.default_image_path, = await q.site.upload(files=['sample.jpeg'])
 
+    # Scratch space for images downloaded by clients
+    q.app.scratch = scratch.ScratchSpace(
+        root=constants.SCRATCH_DIR,
+        quota=constants.SCRATCH_QUOTA,
+        timeout=constants.SCRATCH_CLIENT_TIMEOUT
+    )
+
+    # Directory of datasets on the server, read and written by running augmentations on a dataset
+    os.makedirs(constants.DATASET_ROOT, exist_ok=True)
+
+    # Worker threads for augmenting images off the event loop, shared across clients
+    q.app.executor = ThreadPoolExecutor(max_workers=constants.AUGMENTATION_WORKERS)
+
+    # Worker processes for augmenting datasets, shared across clients and started when first used
+    # Workers are spawned rather than forked, as OpenCV can deadlock in processes forked from a multithreaded process
+    q.app.dataset_executor = ProcessPoolExecutor(
+        max_workers=constants.DATASET_WORKERS,
+        mp_context=multiprocessing.get_context('spawn')
+    )
+
     q.app.initialized = True
 
 
@@ -78,14 +113,19 @@ async def initialize_client(q: Q):
 
     # Set initial argument values
     q.client.theme_dark = True
+    q.client.scratch_id = str(uuid4())
     q.client.tab = 'light'
     q.client.base_image_path = q.app.default_image_path
     q.client.base_image = q.app.default_image
+    q.client.preview_image = q.app.default_preview
     q.client.images = 2
     q.client.augmented_image_paths = [q.client.base_image_path] * q.client.images
+    q.client.augmented_replays = []
     q.client.augmentations = []
     for augmentation in constants.AUGMENTATIONS:
         q.client[augmentation] = False
+    q.client.dataset_copies = 1
+    q.client.dataset_running = False
 
     # Add layouts, header and footer
     q.page['meta'] = cards.meta
@@ -171,7 +211,14 @@ async def upload(q: Q):
 
     # Update image
     q.client.base_image_path = q.args.upload[0]
-    q.client.base_image = cv2.imread(await q.site.download(q.client.base_image_path, '.'))
+
+    # Download image into a temporary directory, removed once read
+    with tempfile.TemporaryDirectory() as path_dir:
+        image_path = await q.site.download(q.client.base_image_path, path_dir)
+        q.client.base_image = cv2.imread(image_path)
+
+    # Augmentations are previewed on a downscaled image
+    q.client.preview_image = utils.create_preview(image=q.client.base_image)
 
     await update_augmented_images(q)
 
@@ -190,6 +237,7 @@ async def reset_augmentations(q: Q):
 
     # Default image
     q.client.augmented_image_paths = [q.client.base_image_path] * q.client.images
+    q.client.augmented_replays = []
 
     # Update augmentations and images
     q.page['augmentations'] = cards.augmentations(tab=q.client.tab, augs=q.client.augmentations)
@@ -215,27 +263,24 @@ async def update_augmented_images(q: Q):
         [augmentation for augmentation in constants.AUGMENTATIONS if q.client[augmentation]]
     )
 
-    # Compile list of augmentations
-    augmentations = [getattr(A, augmentation)(p=1.0) for augmentation in q.client.augmentations]
-
-    if len(augmentations) == 0:
+    if len(q.client.augmentations) == 0:
         # Default image if no augmentations
         q.client.augmented_image_paths = [q.client.base_image_path] * q.client.images
+        q.client.augmented_replays = []
     else:
-        # Generate augmented images
-        augmentation = A.ReplayCompose(augmentations)
-        for i in range(q.client.images):
-            augmented_image = augmentation(image=q.client.base_image)['image']
-            cv2.imwrite(f'augmented_image_{i+1}.png', augmented_image)
-
-        # Upload images to Wave server
-        q.client.augmented_image_paths = await q.site.upload(
-            [f'augmented_image_{i+1}.png' for i in range(q.client.images)]
+        # Compile pipeline of augmentations, with default parameters
+        augmentation = utils.compile_pipeline(
+            augmentations=tuple((augmentation, ()) for augmentation in q.client.augmentations)
         )
 
-        # Remove images locally
-        for i in range(q.client.images):
-            os.remove(f'augmented_image_{i+1}.png')
+        # Generate previews of augmented images concurrently in worker threads, encoded in memory and displayed as
+        # data URLs, keeping their replays for rendering them at full resolution on demand
+        augmented_images = await asyncio.gather(*[
+            q.exec(q.app.executor, utils.augment_image, augmentation=augmentation, image=q.client.preview_image)
+            for _ in range(q.client.images)
+        ])
+        q.client.augmented_image_paths = [path for path, _ in augmented_images]
+        q.client.augmented_replays = [replay for _, replay in augmented_images]
 
     # Update images
     q.page['images'] = cards.images(
@@ -248,7 +293,232 @@ async def update_augmented_images(q: Q):
     await q.page.save()
 
 
+@on('full_image')
+async def view_full_image(q: Q):
+    """
+    View augmented image at full resolution.
+    """
+    logging.info('Viewing augmented image at full resolution')
+
+    i = int(q.args.full_image)
+
+    if i >= len(q.client.augmented_replays):
+        # Base image if no augmentations
+        image_path = q.client.base_image_path
+    else:
+        # Replay augmentation of the preview on the base image where possible, in the scratch space of the client
+        augmentation = utils.compile_pipeline(
+            augmentations=tuple((augmentation, ()) for augmentation in q.client.augmentations)
+        )
+        path = os.path.join(
+            q.app.scratch.client_dir(q.client.scratch_id),
+            f'augmented_image_{uuid4()}.{constants.IMAGE_FORMAT}'
+        )
+        try:
+            await q.exec(
+                q.app.executor,
+                utils.render_image,
+                augmentation=augmentation,
+                replay=q.client.augmented_replays[i],
+                image=q.client.base_image,
+                path=path
+            )
+            q.app.scratch.add(path, client=q.client.scratch_id)
+            image_path, = await q.site.upload([path])
+        finally:
+            q.app.scratch.remove(path)
+
+        # Only the latest full resolution image of the client is kept on the Wave server
+        await unload_full_image(q)
+        q.client.full_image_url = image_path
+
+    q.page['meta'].dialog = cards.dialog_full_image(image_path=image_path)
+
+    await q.page.save()
+
+
+async def unload_full_image(q: Q):
+    """
+    Remove the latest full resolution image of the client from the Wave server, if any.
+    """
+    if q.client.full_image_url is not None:
+        await q.site.unload(q.client.full_image_url)
+        q.client.full_image_url = None
+
+
+@on('dataset')
+async def show_dataset(q: Q):
+    """
+    Show options for running augmentations on a dataset.
+    """
+    logging.info('Showing options for running augmentations on a dataset')
+
+    q.page['meta'].dialog = cards.dialog_dataset(copies=q.client.dataset_copies)
+
+    await q.page.save()
+
+
+@on('run_dataset')
+@on('dataset_upload')
+async def run_dataset(q: Q):
+    """
+    Run augmentations on a dataset of images in a directory or an uploaded zip.
+    """
+    logging.info('Running augmentations on a dataset')
+
+    # Remove dialog
+    q.page['meta'].dialog = None
+
+    if q.client.dataset_running:
+        logging.warning('Augmentations are already running on a dataset')
+        await q.page.save()
+        return
+
+    # Copies are limited on the server too, as requests are not limited to the values of the spinbox
+    copies = int(q.args.dataset_copies or q.client.dataset_copies)
+    q.client.dataset_copies = min(max(copies, 1), constants.MAX_DATASET_COPIES)
+
+    # Work directory of the dataset in the scratch space of the client
+    job_dir = os.path.join(q.app.scratch.client_dir(q.client.scratch_id), f'dataset_{uuid4()}')
+
+    q.client.dataset_running = True
+    try:
+        # Augmented images are written to the output directory in the datasets directory if given, else archived into
+        # a zip for download
+        if q.args.dataset_output:
+            output_dir = batch.resolve_directory(path=q.args.dataset_output, root=constants.DATASET_ROOT)
+        else:
+            output_dir = os.path.join(job_dir, 'augmented')
+
+        if q.args.dataset_upload:
+            # Extract images of the zip into the work directory, removing the zip once extracted
+            path_zip = await q.site.download(q.args.dataset_upload[0], q.app.scratch.client_dir(q.client.scratch_id))
+            q.app.scratch.add(path_zip, client=q.client.scratch_id)
+            input_dir = os.path.join(job_dir, 'images')
+            try:
+                check_dataset_size(q, size=await q.run(batch.zip_images_size, path_zip=path_zip), extracted=True)
+                await q.run(batch.extract_images, path_zip=path_zip, directory=input_dir)
+            finally:
+                q.app.scratch.remove(path_zip)
+
+            paths = await q.run(batch.list_images, directory=input_dir)
+        else:
+            input_dir = batch.resolve_directory(path=q.args.dataset_dir or '', root=constants.DATASET_ROOT)
+            if not os.path.isdir(input_dir):
+                raise ValueError(f'Input directory "{q.args.dataset_dir}" does not exist')
+
+            paths = await q.run(batch.list_images, directory=input_dir)
+            check_dataset_size(q, size=await q.run(batch.images_size, paths=paths), extracted=False)
+
+        throughput = await augment_dataset(q, paths=paths, input_dir=input_dir, output_dir=output_dir)
+
+        if q.args.dataset_output:
+            q.page['dataset'] = cards.dataset(
+                n_augmented=len(paths),
+                n_images=len(paths),
+                throughput=throughput,
+                output_dir=output_dir
+            )
+        else:
+            path_zip = await q.run(
+                batch.archive_images,
+                directory=output_dir,
+                path_zip=os.path.join(job_dir, 'augmented.zip')
+            )
+            q.app.scratch.add(path_zip, client=q.client.scratch_id)
+            try:
+                download_path, = await q.site.upload([path_zip])
+            finally:
+                q.app.scratch.remove(path_zip)
+
+            q.page['dataset'] = cards.dataset(
+                n_augmented=len(paths),
+                n_images=len(paths),
+                throughput=throughput,
+                download_path=download_path
+            )
+    finally:
+        shutil.rmtree(job_dir, ignore_errors=True)
+        q.client.dataset_running = False
+
+    await q.page.save()
+
+
+def check_dataset_size(q: Q, size: int, extracted: bool):
+    """
+    Check that images of a dataset of size bytes, if extracted into scratch space, and their augmented copies, if
+    archived for download, fit within the maximum size of a dataset in scratch space.
+    """
+    copies = 0 if q.args.dataset_output else q.client.dataset_copies
+    required = size * (int(extracted) + copies)
+
+    if required > constants.MAX_DATASET_SIZE:
+        raise ValueError(
+            f'Dataset requires about {required / 1024 ** 2:.0f} MB of scratch space, '
+            f'more than the maximum of {constants.MAX_DATASET_SIZE / 1024 ** 2:.0f} MB'
+        )
+
+
+async def augment_dataset(q: Q, paths: list[str], input_dir: str, output_dir: str) -> float:
+    """
+    Augment images of a dataset in worker processes, updating the progress.
+    Returns the throughput in images/sec.
+    """
+    augmentations = tuple((augmentation, ()) for augmentation in q.client.augmentations)
+
+    n_augmented, n_written = 0, 0
+    start = updated = time.monotonic()
+    pending = set()
+    images = iter(paths)
+
+    q.page['dataset'] = cards.dataset(n_augmented=0, n_images=len(paths), throughput=0)
+    await q.page.save()
+
+    try:
+        while True:
+            # Keep a bounded number of images in the workers, so memory is bounded for datasets of any size
+            # Futures of the pool are awaited directly, as q.exec wraps functions in a context that cannot be pickled
+            for path in itertools.islice(images, constants.DATASET_PENDING_IMAGES - len(pending)):
+                pending.add(asyncio.wrap_future(q.app.dataset_executor.submit(
+                    batch.augment_file,
+                    path=path,
+                    input_dir=input_dir,
+                    output_dir=output_dir,
+                    augmentations=augmentations,
+                    copies=q.client.dataset_copies
+                )))
+
+            if len(pending) == 0:
+                break
+
+            finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            n_augmented += len(finished)
+            n_written += sum(future.result() for future in finished)
+
+            # Update progress
+            now = time.monotonic()
+            if now - updated >= constants.DATASET_PROGRESS_INTERVAL:
+                updated = now
+                q.page['dataset'] = cards.dataset(
+                    n_augmented=n_augmented,
+                    n_images=len(paths),
+                    throughput=n_augmented / (now - start)
+                )
+                await q.page.save()
+    finally:
+        # Images not yet augmented are cancelled on errors
+        for future in pending:
+            future.cancel()
+
+    throughput = n_augmented / max(time.monotonic() - start, 1e-9)
+    logging.info(f'Augmented {n_augmented} images into {n_written} images at {throughput:.1f} images/sec')
+
+    return throughput
+
+
 @on('dialog_new_image.dismissed')
+@on('dialog_full_image.dismissed')
+@on('dialog_dataset.dismissed')
 async def dismiss_dialog(q: Q):
     """
     Dismiss dialog.
@@ -299,6 +569,10 @@ async def reload_client(q: Q):
     # Clear all cards
     clear_cards(q, q.app.cards)
 
+    # Release scratch space of the client, and its image on the Wave server
+    q.app.scratch.release(q.client.scratch_id)
+    await unload_full_image(q)
+
     # Reload the client
     await initialize_client(q)
 
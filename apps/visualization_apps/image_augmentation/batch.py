@@ -0,0 +1,94 @@
+import logging
+import os
+import shutil
+import zipfile
+from pathlib import Path
+
+import cv2
+
+import constants
+import utils
+
+
+def resolve_directory(path: str, root: str) -> str:
+    """
+    Resolve a directory relative to a root directory, rejecting directories outside of it.
+    """
+    root = Path(root).resolve()
+    directory = (root / path).resolve()
+    if not directory.is_relative_to(root):
+        raise ValueError(f'Directory "{path}" is outside of the datasets directory')
+
+    return str(directory)
+
+
+def zip_images_size(path_zip: str) -> int:
+    """
+    Total size in bytes of images of a zip file once extracted.
+    """
+    with zipfile.ZipFile(path_zip) as file:
+        return sum(
+            member.file_size for member in file.infolist()
+            if Path(member.filename).suffix.lower() in constants.DATASET_IMAGE_SUFFIXES
+        )
+
+
+def images_size(paths: list[str]) -> int:
+    """
+    Total size in bytes of images.
+    """
+    return sum(os.path.getsize(path) for path in paths)
+
+
+def extract_images(path_zip: str, directory: str):
+    """
+    Extract images of a zip file into a directory, keeping their relative paths.
+    """
+    with zipfile.ZipFile(path_zip) as file:
+        for member in file.namelist():
+            if Path(member).suffix.lower() in constants.DATASET_IMAGE_SUFFIXES:
+                file.extract(member, directory)
+
+
+def list_images(directory: str) -> list[str]:
+    """
+    List images in a directory and its subdirectories.
+    """
+    return sorted(
+        str(path) for path in Path(directory).rglob('*')
+        if path.is_file() and path.suffix.lower() in constants.DATASET_IMAGE_SUFFIXES
+    )
+
+
+def augment_file(path: str, input_dir: str, output_dir: str, augmentations: tuple[tuple[str, tuple], ...],
+                 copies: int, image_format: str = constants.IMAGE_FORMAT,
+                 quality: int = constants.IMAGE_QUALITY) -> int:
+    """
+    Augment an image into copies in the output directory, keeping its path relative to the input directory.
+    Run in a worker process, which reads and writes the image itself so that only paths are sent between processes,
+    and compiles the pipeline of augmentations once. Returns the number of augmented images written.
+    """
+    image = cv2.imread(path)
+    if image is None:
+        logging.warning(f'Unable to read image {path}')
+        return 0
+
+    pipeline = utils.compile_pipeline(augmentations=augmentations)
+    params = utils.image_params(image_format=image_format, quality=quality)
+
+    relative_path = Path(path).relative_to(input_dir)
+    path_output = Path(output_dir) / relative_path.parent
+    path_output.mkdir(parents=True, exist_ok=True)
+
+    for copy in range(copies):
+        path_image = path_output / f'{relative_path.stem}_{copy + 1}.{image_format}'
+        cv2.imwrite(str(path_image), pipeline(image=image)['image'], params)
+
+    return copies
+
+
+def archive_images(directory: str, path_zip: str) -> str:
+    """
+    Archive images of a directory into a zip file.
+    """
+    return shutil.make_archive(str(Path(path_zip).with_suffix('')), 'zip', directory)
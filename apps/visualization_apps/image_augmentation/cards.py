@@ -3,6 +3,8 @@ import traceback
 
 from h2o_wave import Q, expando_to_dict, ui
 
+import constants
+
 # App name
 app_name = 'Image Augmentation'
 
@@ -171,10 +173,22 @@ def images(base_image_path: str, augmented_image_paths: list[str], n_images: int
                 ],
                 justify='center'
             ),
+            ui.inline(
+                items=[
+                    ui.button(
+                        name='full_image',
+                        label='Full Resolution',
+                        value=str(i),
+                        width='25%'
+                    ) for i in range(len(augmented_image_paths))
+                ],
+                justify='center'
+            ),
             ui.inline(
                 items=[
                     ui.slider(name='images', label='Images', min=1, max=4, value=n_images, trigger=True, width='200px'),
-                    ui.button(name='reset', label='Reset', primary=True)
+                    ui.button(name='reset', label='Reset', primary=True),
+                    ui.button(name='dataset', label='Run on Dataset')
                 ],
                 justify='center'
             ),
@@ -194,6 +208,88 @@ def images(base_image_path: str, augmented_image_paths: list[str], n_images: int
     return card
 
 
+def dialog_full_image(image_path: str) -> ui.Dialog:
+    """
+    Dialog for viewing augmented image at full resolution.
+    """
+    dialog = ui.dialog(
+        name='dialog_full_image',
+        title='Full Resolution',
+        items=[ui.image(title='full_image', path=image_path, width='100%')],
+        width='80%',
+        closable=True,
+        events=['dismissed']
+    )
+
+    return dialog
+
+
+def dialog_dataset(copies: int) -> ui.Dialog:
+    """
+    Dialog for running augmentations on a dataset.
+    """
+    dialog = ui.dialog(
+        name='dialog_dataset',
+        title='Run on Dataset',
+        items=[
+            ui.spinbox(
+                name='dataset_copies',
+                label='Augmented Copies per Image',
+                min=1,
+                max=constants.MAX_DATASET_COPIES,
+                step=1,
+                value=copies
+            ),
+            ui.textbox(
+                name='dataset_output',
+                label='Output Directory',
+                placeholder=f'Directory in {constants.DATASET_ROOT} on the server, or empty to download a zip'
+            ),
+            ui.separator(label='Directory of Images'),
+            ui.textbox(
+                name='dataset_dir',
+                label='Input Directory',
+                placeholder=f'Directory in {constants.DATASET_ROOT} on the server'
+            ),
+            ui.buttons(items=[ui.button(name='run_dataset', label='Run', primary=True)]),
+            ui.separator(label='Zip of Images'),
+            ui.file_upload(name='dataset_upload', label='Upload and Run', file_extensions=['zip'])
+        ],
+        closable=True,
+        events=['dismissed']
+    )
+
+    return dialog
+
+
+def dataset(n_augmented: int, n_images: int, throughput: float, download_path: str = None,
+            output_dir: str = None) -> ui.FormCard:
+    """
+    Card for progress of augmenting a dataset.
+    """
+    if download_path is not None:
+        output = ui.link(label='Download Augmented Images', path=download_path, download=True, button=True)
+    elif output_dir is not None:
+        output = ui.text(f'Augmented images: {output_dir}')
+    else:
+        output = ui.text('Augmenting images...')
+
+    card = ui.form_card(
+        box='images',
+        items=[
+            ui.separator(label='Dataset'),
+            ui.progress(
+                label='Images',
+                caption=f'{n_augmented}/{n_images} images, {throughput:.1f} images/sec',
+                value=n_augmented / n_images if n_images > 0 else 1
+            ),
+            output
+        ]
+    )
+
+    return card
+
+
 def crash_report(q: Q) -> ui.FormCard:
     """
     Card for capturing the stack trace and current application state, for error reporting.
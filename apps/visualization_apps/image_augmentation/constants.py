@@ -39,3 +39,51 @@ AUGMENTATIONS = [
     'ZoomBlur',
 
 ]
+
+# Directory of scratch space for files downloaded by clients
+SCRATCH_DIR = 'scratch'
+
+# Maximum total size in bytes of files in scratch space, beyond which files not used by any client are evicted
+SCRATCH_QUOTA = 1024 ** 3
+
+# Time in seconds after which scratch space of an idle client is released
+SCRATCH_CLIENT_TIMEOUT = 60 * 60
+
+# Format of augmented images, one of 'jpeg', 'webp' or 'png'
+IMAGE_FORMAT = 'jpeg'
+
+# Formats of augmented images
+IMAGE_FORMATS = ['jpeg', 'webp', 'png']
+
+# Quality (0-100) of augmented images in the jpeg and webp formats
+IMAGE_QUALITY = 90
+
+# Number of worker threads augmenting images, shared across clients
+AUGMENTATION_WORKERS = 4
+
+# Maximum number of compiled pipelines of augmentations cached
+PIPELINE_CACHE_SIZE = 256
+
+# Maximum width and height in pixels of previews of augmented images, rendered at full resolution on demand
+PREVIEW_SIZE = 512
+
+# Directory of datasets on the server, outside of which datasets cannot be read or written
+DATASET_ROOT = 'datasets'
+
+# Maximum size in bytes of images of a dataset and their augmented copies kept in scratch space
+MAX_DATASET_SIZE = 512 * 1024 ** 2
+
+# Suffixes of images in datasets
+DATASET_IMAGE_SUFFIXES = ['.bmp', '.jpeg', '.jpg', '.png', '.webp']
+
+# Number of worker processes augmenting images of a dataset
+DATASET_WORKERS = 4
+
+# Maximum number of images of a dataset being augmented at once, bounding memory for datasets of any size
+DATASET_PENDING_IMAGES = 16
+
+# Maximum number of augmented copies of each image of a dataset
+MAX_DATASET_COPIES = 10
+
+# Time in seconds between updates of the progress of augmenting a dataset
+DATASET_PROGRESS_INTERVAL = 1
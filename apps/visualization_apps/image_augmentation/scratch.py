@@ -0,0 +1,109 @@
+import logging
+import os
+import shutil
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+
+class ScratchSpace:
+    """
+    Scratch space for files downloaded by clients, with a directory per client and a quota on the total size of files.
+    Least recently used files are evicted beyond the quota, except files of clients in use. Wave does not report clients
+    disconnecting, so directories of clients without any request for longer than the timeout are removed instead.
+    """
+
+    def __init__(self, root: str, quota: int, timeout: float):
+        self.root = Path(root)
+        self.quota = quota
+        self.timeout = timeout
+        self.size = 0
+        self.files = OrderedDict()
+        self.clients = {}
+
+        # Files left over from previous runs of the app are not tracked, so are removed
+        shutil.rmtree(self.root, ignore_errors=True)
+        self.root.mkdir(parents=True)
+
+    def touch(self, client: str):
+        """
+        Mark a client as active, on every request of the client.
+        """
+
+        self.clients[client] = time.monotonic()
+
+    def client_dir(self, client: str) -> str:
+        """
+        Get directory of a client, for downloading its files.
+        """
+
+        self.clients[client] = time.monotonic()
+
+        path = self.root / 'clients' / client
+        path.mkdir(parents=True, exist_ok=True)
+
+        return str(path)
+
+    def add(self, path: str, client: str):
+        """
+        Add a file used by a client, or mark it as recently used if already added.
+        """
+
+        self.clients[client] = time.monotonic()
+
+        if path in self.files:
+            self.size -= self.files[path]['size']
+        else:
+            self.files[path] = {'size': 0, 'clients': set()}
+
+        self.files[path]['size'] = os.path.getsize(path)
+        self.files[path]['clients'].add(client)
+        self.files.move_to_end(path)
+        self.size += self.files[path]['size']
+
+        self.evict()
+
+    def remove(self, path: str):
+        """
+        Remove a file.
+        """
+
+        if path in self.files:
+            self.size -= self.files.pop(path)['size']
+
+        if os.path.exists(path):
+            os.remove(path)
+
+    def release(self, client: str):
+        """
+        Remove directory of a client, and its files.
+        """
+
+        self.clients.pop(client, None)
+
+        path_client = self.root / 'clients' / client
+        for path in [path for path in self.files if Path(path).parent == path_client]:
+            self.remove(path)
+
+        shutil.rmtree(path_client, ignore_errors=True)
+
+    def evict(self):
+        """
+        Release clients idle for longer than the timeout, and evict least recently used files not used by any client
+        in use while beyond the quota.
+        """
+
+        now = time.monotonic()
+        for client in [client for client, seen in self.clients.items() if now - seen > self.timeout]:
+            logging.info(f'Releasing scratch space of idle client {client}')
+            self.release(client)
+
+        for path in list(self.files):
+            if self.size <= self.quota:
+                break
+
+            if not self.files[path]['clients'] & self.clients.keys():
+                logging.info(f'Evicting {path} from scratch space')
+                self.remove(path)
+
+        logging.info(f'Scratch space: {len(self.files)} files, {self.size} bytes')
@@ -0,0 +1,100 @@
+import base64
+import logging
+from functools import lru_cache
+
+import albumentations as A
+import cv2
+import numpy as np
+
+import constants
+
+# Encoding parameters of OpenCV for the quality of each image format
+QUALITY_PARAMS = {
+    'jpeg': cv2.IMWRITE_JPEG_QUALITY,
+    'webp': cv2.IMWRITE_WEBP_QUALITY
+}
+
+
+def image_params(image_format: str, quality: int) -> list[int]:
+    """
+    Encoding parameters of OpenCV for the quality of an image format.
+    """
+    return [QUALITY_PARAMS[image_format], quality] if image_format in QUALITY_PARAMS else []
+
+
+def encode_image(image: np.ndarray, image_format: str = constants.IMAGE_FORMAT,
+                 quality: int = constants.IMAGE_QUALITY) -> str:
+    """
+    Encode image in memory into a data URL, displayed without writing it to disk or uploading it to Wave.
+    """
+    if image_format not in constants.IMAGE_FORMATS:
+        raise ValueError(f'Unknown image format "{image_format}", use one of {", ".join(constants.IMAGE_FORMATS)}')
+
+    success, buffer = cv2.imencode(f'.{image_format}', image, image_params(image_format=image_format, quality=quality))
+    if not success:
+        raise ValueError(f'Unable to encode image as {image_format}')
+
+    return f'data:image/{image_format};base64,{base64.b64encode(buffer).decode()}'
+
+
+def create_preview(image: np.ndarray, size: int = constants.PREVIEW_SIZE) -> np.ndarray:
+    """
+    Downscale image to fit within size pixels, for previewing augmentations at the size they are displayed.
+    """
+    height, width = image.shape[:2]
+    scale = size / max(height, width)
+    if scale >= 1:
+        return image
+
+    return cv2.resize(image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+
+
+@lru_cache(maxsize=constants.PIPELINE_CACHE_SIZE)
+def compile_pipeline(augmentations: tuple[tuple[str, tuple], ...]) -> A.ReplayCompose:
+    """
+    Compile pipeline of augmentations, each a name with its parameters as (parameter, value) pairs, eg:
+    (('Blur', (('blur_limit', 7),)), ('HorizontalFlip', ())). Compiled pipelines are cached and shared across clients.
+    """
+    return A.ReplayCompose([getattr(A, name)(p=1.0, **dict(params)) for name, params in augmentations])
+
+
+def augment_image(augmentation: A.ReplayCompose, image: np.ndarray) -> tuple[str, dict]:
+    """
+    Augment image and encode it into a data URL, run in a worker thread of the app.
+    Returns the data URL and the replay of the augmentation, for rendering it again at full resolution.
+    """
+    augmented = augmentation(image=image)
+
+    return encode_image(image=augmented['image']), augmented['replay']
+
+
+def is_replayable(augmentation: A.ReplayCompose, replay: dict) -> bool:
+    """
+    Check if the replay of an augmentation can be replayed on an image of another size. Transforms applied with
+    parameters computed from the image, eg noise, masks or regions of its size, cannot be replayed.
+    """
+    return not any(
+        transform_replay['applied'] and getattr(transform, 'targets_as_params', [])
+        for transform, transform_replay in zip(augmentation.transforms, replay['transforms'])
+    )
+
+
+def render_image(augmentation: A.ReplayCompose, replay: dict, image: np.ndarray, path: str,
+                 quality: int = constants.IMAGE_QUALITY):
+    """
+    Replay augmentation on image and save it in the format of its path, run in a worker thread of the app.
+    Augmentations that cannot be replayed on the image are run on it again, with new random parameters.
+    """
+    image_format = path.rsplit('.', 1)[-1]
+
+    augmented_image = None
+    if is_replayable(augmentation=augmentation, replay=replay):
+        try:
+            augmented_image = A.ReplayCompose.replay(replay, image=image)['image']
+        except Exception as error:
+            logging.warning(f'Unable to replay augmentation, running it again: {error}')
+
+    if augmented_image is None:
+        augmented_image = augmentation(image=image)['image']
+
+    cv2.imwrite(path, augmented_image, image_params(image_format=image_format, quality=quality))